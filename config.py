@@ -1,3 +1,9 @@
+import os
+
 dimension = 8
 SHAPE = "SQUARE"
 atoms = 5
+heatmap = False
+log = False
+profile = False
+cache = os.path.join(os.path.expanduser('~'), '.cache', 'blackbox')
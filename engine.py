@@ -1,5 +1,13 @@
-from config import dimension, atoms
-from random import randint
+from config import dimension, atoms, SHAPE
+from random import Random, getrandbits
+from time import perf_counter_ns
+
+from topology import ATOM, get
+
+# Outcome codes of rays (see: Board.outcome). Positive codes are numbers of exit.
+HIT = 0
+REFLECTION = -1
+EDGE = -2
 
 
 class Marker:
@@ -7,6 +15,8 @@ class Marker:
     Numbered markers around the board edge. May contain beam results or links to other markers.
     """
 
+    __slots__ = ('number', 'link', 'symbol', 'text', 'index')
+
     def __init__(self, number, index=False):
         """Initializes game board edges."""
 
@@ -25,6 +35,8 @@ class Space:
     Numbered game board spaces in which an atom, field, or guess may exist.
     """
 
+    __slots__ = ('number', 'atom', 'field', 'guess', 'correct', 'x_pos', 'y_pos')
+
     def __init__(self, number, atom, field, x_pos, y_pos):
         """Initializes game spaces."""
 
@@ -41,93 +53,57 @@ class Ray:
     Rays travel in straight paths and are redirected by fields until they strike an atom or leave the board.
     """
 
-    def __init__(self, origin):
+    def __init__(self, origin, topology=None):
         """Set ray direction and starting position based on its marker of origin."""
 
+        if topology is None:
+            topology = get(SHAPE, dimension)
+
         self.origin = origin
+        self.topology = topology
 
-        # Determine ray direction and starting position
-        # East: 1 - 8
-        if self.origin <= dimension:
-            self.direction = 'e'
-            self.x = 0
-            self.y = dimension - self.origin
-        # North: 9 - 16
-        elif dimension < self.origin <= 2 * dimension:
-            self.direction = 'n'
-            self.x = self.origin - dimension - 1
-            self.y = 0
-        # West: 17 - 24
-        elif 2 * dimension < self.origin <= 3 * dimension:
-            self.direction = 'w'
-            self.x = dimension - 1
-            self.y = self.origin - (2 * dimension) - 1
-        # South: 24 - 32
-        elif 3 * dimension < self.origin <= 4 * dimension:
-            self.direction = 's'
-            self.x = (4 * dimension) - self.origin
-            self.y = dimension - 1
+        # Counted by Board.travel, if asked to
+        self.steps = 0
+        self.turns = 0
+
+        # Determine ray direction and starting cell
+        self.cell, self.direction = topology.entries[origin]
+
+    @property
+    def x(self):
+        return self.topology.cells[self.cell][0]
+
+    @property
+    def y(self):
+        return self.topology.cells[self.cell][1]
 
     def turn(self, field):
         """Turn ray away from atom upon encountering its field."""
 
-        if field == 1:
-            if self.direction == 'w':
-                self.direction = 'n'
-            elif self.direction == 's':
-                self.direction = 'e'
-        if field == 2:
-            if self.direction == 'e':
-                self.direction = 'n'
-            elif self.direction == 's':
-                self.direction = 'w'
-        if field == 3:
-            if self.direction == 'e':
-                self.direction = 's'
-            elif self.direction == 'n':
-                self.direction = 'w'
-        if field == 4:
-            if self.direction == 'n':
-                self.direction = 'e'
-            elif self.direction == 'w':
-                self.direction = 's'
+        self.direction = self.topology.turn[field * self.topology.directions + self.direction]
 
     def advance(self):
-        """Advance ray in a straight path."""
+        """Advance ray in a straight path. Leaving the board sets cell to minus the marker of exit."""
 
-        if self.direction == 'e':
-            self.x += 1
-        elif self.direction == 'n':
-            self.y += 1
-        elif self.direction == 'w':
-            self.x -= 1
-        elif self.direction == 's':
-            self.y -= 1
+        self.cell = self.topology.step[self.cell * self.topology.directions + self.direction]
 
     def edge(self):
         """Check if ray leaves the game board and return the marker of its exit."""
 
-        end = 'null'
-
-        if self.x < 0:
-            end = dimension - self.y
-        elif self.x > 7:
-            end = self.y + 1 + (dimension * 2)
-        elif self.y < 0:
-            end = self.x + 1 + dimension
-        elif self.y > 7:
-            end = (dimension * 4) - self.x
-        else:
-            end = 'null'
-        return end
+        if self.cell < 0:
+            return -self.cell
+        return 'null'
 
 
 class Board:
     """
-    Game board composed of a grid of spaces.
+    Game board composed of spaces, shaped as set by config.SHAPE (see: topology.py).
     """
 
-    def __init__(self):
+    # Optional instrumentation shared by all boards unless overridden (see: instrument.py)
+    stats = None
+
+    def __init__(self, log=None):
         """
         Game board is created. Atoms randomly assigned positions. Fields determined. Score initialized.
 
@@ -138,6 +114,12 @@ class Board:
         score       Game score.
         spaces      Dict of spaces (see: class Spaces) composing the game board. spaces[(x, y)]
         spacelist   Dict of spaces organized by number, used for access by main.py
+        fields      List of field codes (see: check), indexed by space number, traced by rays
+        topology    Tables describing the board's shape (see: topology.py)
+        outcomes    Precomputed outcome code of every marker (see: outcome), or None to send rays
+        paths       Set of spaces each marker's outcome depends on (see: survey), or None if not traced
+        seed        Seed the atoms were randomly placed from, or None if they were given.
+        log         Optional event log recording resets, beams, guesses and end scores (see: gamelog.py)
         """
 
         # Create lists and dicts
@@ -148,16 +130,33 @@ class Board:
         self.score = 0
         self.spaces = {}
         self.spacelist = {}
+        self.fields = []
+        self.outcomes = None
+        self.paths = None
         self.game_over = False
+        self.seed = None
+        self.log = log
+        self.topology = get(SHAPE, dimension)
 
         # Create board
         self.reset(True)
 
-    def reset(self, init=False):
+    def reset(self, init=False, board=None, atomlist=None, seed=None, fields=None, outcomes=None):
         """
         Game board is reset. Marker indexes are the only thing preserved.
+
+        If a pre-generated 'board' is given (see: worker.py), its atoms and spaces are adopted
+        instead of generating new ones. If an 'atomlist' is given, atoms are placed there.
+        Otherwise atoms are placed randomly from 'seed', or from a new random seed.
+
+        Precomputed 'fields' and 'outcomes' for the given atoms may be passed along (see: pack.py),
+        so that neither fields nor rays are computed.
         """
 
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter_ns()
+
         # Reset lists and dicts
         self.atomlist = []
         self.guesslist = []
@@ -165,71 +164,109 @@ class Board:
         self.score = 0
         self.spaces = {}
         self.spacelist = {}
+        self.outcomes = outcomes
         self.game_over = False
+        self.seed = seed
+
+        # Adopt pre-generated layout
+        if board is not None:
+            self.seed = board.seed
+            self.atomlist = board.atomlist
+            self.spaces = board.spaces
+            self.spacelist = board.spacelist
+            self.fields = board.fields
+            self.outcomes = board.outcomes
+            self.paths = None
 
-        # Assign atom coordinates randomly, and forbid overlapping
-        i = 0
-        while i < atoms:
-            while True:
-                x = randint(1, dimension - 1)
-                y = randint(1, dimension - 1)
-                if (x, y) not in self.atomlist:
-                    break
-            self.atomlist.append((x, y))
-            i += 1
+        else:
+            # Place given atoms
+            if atomlist is not None:
+                self.atomlist = list(atomlist)
 
-        # Populate board spaces
-        i, x, y = 0, 0, 0
-        while i < (dimension * dimension):
-            while x < dimension:
-                # Check for atom
-                if (x, y) in self.atomlist:
-                    self.spaces[(x, y)] = Space(i, True, 0, x, y)
-                    self.spacelist[i] = self.spaces[(x, y)]
-                    x += 1
-                    i += 1
-                # Empty space
-                else:
-                    self.spaces[(x, y)] = Space(i, False, 0, x, y)
-                    self.spacelist[i] = self.spaces[(x, y)]
-                    x += 1
+            # Assign atom coordinates randomly, and forbid overlapping
+            else:
+                self.seed = getrandbits(32) if seed is None else seed
+                random = Random(self.seed)
+                low, high = self.topology.box
+                index = self.topology.index
+                sites = self.topology.sites
+                i = 0
+                while i < atoms:
+                    while True:
+                        x = random.randint(low, high)
+                        y = random.randint(low, high)
+                        if (x, y) not in self.atomlist and index.get((x, y), -1) in sites:
+                            break
+                    self.atomlist.append((x, y))
                     i += 1
-            y += 1
-            x %= dimension
+
+            self.populate(fields)
+
+        self.markers_reset(init)
+
+        if self.log is not None:
+            self.log.reset(self.atomlist)
+        if stats is not None:
+            stats.reset(perf_counter_ns() - start)
+
+    def populate(self, fields=None):
+        """Create board spaces and fields for the atoms in atomlist. Precomputed 'fields' are used if given."""
+
+        topology = self.topology
+        self.spaces = {}
+        self.spacelist = {}
+        self.paths = None
+
+        # Populate board spaces
+        for i, (x, y) in enumerate(topology.cells):
+            self.spaces[(x, y)] = Space(i, False, 0, x, y)
+            self.spacelist[i] = self.spaces[(x, y)]
+
+        atomcells = [topology.index[atom] for atom in self.atomlist]
+        for cell in atomcells:
+            self.spacelist[cell].atom = True
+
+        if fields is not None:
+            self.fields = list(fields)
+            for i, field in enumerate(self.fields):
+                if field != ATOM:
+                    self.spacelist[i].field = field
+            return
+
+        self.fields = [0] * len(topology.cells)
 
         # Set fields for each atom
         # Corner (X) fields
-        for atom in self.atomlist:
-            x, y = atom
-            self.field(x + 1, y + 1, 1)
-            self.field(x - 1, y + 1, 2)
-            self.field(x - 1, y - 1, 3)
-            self.field(x + 1, y - 1, 4)
+        for cell in atomcells:
+            for target, quad in topology.corners[cell]:
+                self.apply(target, quad)
 
         # Cross fields overwrite
-        for atom in self.atomlist:
-            x, y = atom
-            self.field(x + 1, y, 6)
-            self.field(x - 1, y, 6)
-            self.field(x, y + 1, 6)
-            self.field(x, y - 1, 6)
-
-        # Populate dict of markers, keys are numbered
-        for i in range(dimension * 4):
+        for cell in atomcells:
+            for target in topology.crosses[cell]:
+                self.apply(target, topology.cross)
+
+        # Atoms are traced as fields of their own
+        for cell in atomcells:
+            self.fields[cell] = ATOM
+
+    def markers_reset(self, init=False):
+        """Populate dict of markers, keys are numbered. Marker indexes are preserved unless initializing."""
+
+        for i in range(self.topology.markers):
             if init is True:
                 self.markers[i + 1] = Marker(i + 1)
 
             # Preserve marker index on reset
             else:
-                for i in range(dimension * 4):
-                    index = self.markers[i + 1].index
-                    self.markers[i + 1] = Marker(i + 1, index)
+                index = self.markers[i + 1].index
+                self.markers[i + 1] = Marker(i + 1, index)
 
     def field(self, x, y, quad):
         """
         Apply field of given quadrant to given space. Check for fields overlap.
 
-        'quad' indicates the location of the field relative to the atom:
+        'quad' indicates the location of the field relative to the atom (on a square board):
         1 - 4 are corner fields (corresponding to graph quadrants), causing detours
         5 indicates a mirror, caused by overlapping corner fields
         6 is a cross field, which cancels corner fields
@@ -238,20 +275,127 @@ class Board:
         """
 
         # Do nothing if coordinates are off the board
-        if x > 7 or y > 7 or x < 0 or y < 0:
+        cell = self.topology.index.get((x, y))
+        if cell is None:
             return 1
 
+        self.apply(cell, quad)
+
+    def apply(self, cell, quad):
+        """Apply field to the space with the given number (see: field)."""
+
+        mirror = self.topology.mirror
+        cross = self.topology.cross
+        space = self.spacelist[cell]
+
         # Create mirror if there is already a corner field present
-        elif 0 < self.spaces[(x, y)].field < 5 and quad != 6:
-            self.spaces[(x, y)].field = 5
+        if 0 < space.field < mirror and quad != cross:
+            space.field = mirror
 
         # Cross fields overwrite corners
-        elif quad == 6:
-            self.spaces[(x, y)].field = 6
+        elif quad == cross:
+            space.field = cross
 
         # Write corner fields to space
         else:
-            self.spaces[(x, y)].field = quad
+            space.field = quad
+
+        if self.fields[cell] != ATOM:
+            self.fields[cell] = space.field
+
+    def move_atom(self, old, new):
+        """
+        Move the atom at coordinates 'old' to 'new', keeping its place in atomlist.
+
+        Only the fields around both spaces are recomputed, and if the board keeps an outcome table, only
+        rays whose paths cross a changed space are traced again (see: update). Meant for editing layouts,
+        such as when generating puzzles; markers and score are left alone.
+
+        Raises ValueError if there is no atom at 'old', or 'new' is off the board or taken.
+        """
+
+        index = self.topology.index
+        if old not in self.atomlist:
+            raise ValueError('no atom at %s' % (old,))
+        if new not in index or new in self.atomlist:
+            raise ValueError('cannot place atom at %s' % (new,))
+
+        self.atomlist[self.atomlist.index(old)] = new
+        self.update(index[old], index[new])
+
+    def add_atom(self, atom):
+        """Add an atom at the given coordinates, last in atomlist (see: move_atom)."""
+
+        index = self.topology.index
+        if atom not in index or atom in self.atomlist:
+            raise ValueError('cannot place atom at %s' % (atom,))
+
+        self.atomlist.append(atom)
+        self.update(index[atom])
+
+    def remove_atom(self, atom):
+        """Remove the atom at the given coordinates (see: move_atom)."""
+
+        if atom not in self.atomlist:
+            raise ValueError('no atom at %s' % (atom,))
+
+        self.atomlist.remove(atom)
+        self.update(self.topology.index[atom])
+
+    def update(self, *cells):
+        """
+        Recompute fields around the given spaces after atoms were placed there or taken away, then
+        bring outcomes up to date (see: retrace).
+
+        Overlapping fields depend on the order atoms are listed in (see: apply), so the fields of affected
+        spaces are worked out again from every atom, in order, as populate would.
+        """
+
+        topology = self.topology
+        corners = topology.corners
+        crosses = topology.crosses
+        mirror = topology.mirror
+        cross = topology.cross
+        fields = self.fields
+        spacelist = self.spacelist
+
+        # Spaces an atom at any of the given cells casts fields on
+        codes = dict.fromkeys(cells, 0)
+        for cell in cells:
+            for target, quad in corners[cell]:
+                codes[target] = 0
+            for target in crosses[cell]:
+                codes[target] = 0
+
+        # Corner (X) fields, then crosses, as in populate
+        atomcells = [topology.index[atom] for atom in self.atomlist]
+        for cell in atomcells:
+            for target, quad in corners[cell]:
+                if target in codes:
+                    field = codes[target]
+                    codes[target] = mirror if 0 < field < mirror else quad
+        for cell in atomcells:
+            for target in crosses[cell]:
+                if target in codes:
+                    codes[target] = cross
+
+        # Write back, noting the spaces whose traced field changed
+        atomset = set(atomcells)
+        changed = set()
+        for cell, field in codes.items():
+            space = spacelist[cell]
+            space.field = field
+            space.atom = cell in atomset
+            if space.atom is True:
+                field = ATOM
+            if fields[cell] != field:
+                fields[cell] = field
+                changed.add(cell)
+
+        # The layout no longer comes from a seed
+        self.seed = None
+
+        self.retrace(changed)
 
     def setmarker(self, origin, result, end=0):
         """
@@ -292,48 +436,28 @@ class Board:
         x and y are given default values so that coordinates do not need to be checked in pairs.
         """
 
-        if x >= dimension or x < 0:
-            return False
-        if y >= dimension or y < 0:
-            return False
-        else:
-            return True
+        return (x, y) in self.topology.index
 
     def check(self, x, y):
-        """Checks game board for atoms or fields at given coordinates. Returns field's value or 9 for an atom."""
+        """
+        Checks game board for atoms or fields at given coordinates. Returns field's value or 9 for an atom.
+
+        On a square board, fields are 1 - 4 for corners, 5 for mirrors and 6 for crosses (see: field).
+        """
 
         # Check that coordinates are on game board
-        if self.onboard(x, y) is False:
-            return 0
-        # Check for atom
-        elif self.spaces[(x, y)].atom is True:
-            return 9
-        # Check for field
-        elif self.spaces[(x, y)].field != 'null':
-            return self.spaces[(x, y)].field
-        else:
+        cell = self.topology.index.get((x, y))
+        if cell is None:
             return 0
+        return self.fields[cell]
 
     def reflection(self, ray):
         """Returns True if there are atoms adjacent to the given ray's point of entry."""
 
-        # Alias variables
-        direction = ray.direction
-        x = ray.x
-        y = ray.y
-
-        # Entering from the sides
-        if direction == 'e' or direction == 'w':
-            if self.check(x, y + 1) == 9 or self.check(x, y - 1) == 9:
-                return True
-            else:
-                return False
-        # Entering from the top or bottom
-        elif direction == 'n' or direction == 's':
-            if self.check(x + 1, y) == 9 or self.check(x - 1, y) == 9:
+        for cell in self.topology.sides[ray.origin]:
+            if self.fields[cell] == ATOM:
                 return True
-            else:
-                return False
+        return False
 
     def beam(self, number):
         """
@@ -342,56 +466,207 @@ class Board:
         Possible return values are 'reflection', 'hit', or number of exit.
         Score increases by for every marker assigned:
         +1 for every hit or reflection and +2 if the ray leaves the board.
+        Reflections at the point of entry are free.
         """
 
-        # Create ray
-        ray = Ray(number)
-        result = 'null'
-        end = 0
+        stats = self.stats
+        if stats is not None:
+            start = perf_counter_ns()
+
+        # Look up precomputed outcome, or send ray
+        if self.outcomes is not None:
+            outcome = self.outcomes[number]
+            steps = turns = 0
+        else:
+            ray = Ray(number, self.topology)
+            outcome = self.shoot(ray, count=stats is not None)
+            steps = ray.steps
+            turns = ray.turns
+
+        # Return result, add to score, and change markers
+        if outcome == EDGE:
+            result = 'R'
+            self.setmarker(number, result)
+        elif outcome > 0:
+            result = outcome
+            self.setmarker(number, 'null', outcome)
+            self.score += 2
+        else:
+            result = 'H' if outcome == HIT else 'R'
+            self.setmarker(number, result)
+            self.score += 1
+
+        if self.log is not None:
+            self.log.beam(number, result)
+        if stats is not None:
+            stats.beam(perf_counter_ns() - start, result, steps, turns, outcome == EDGE)
+        return result
+
+    def trace(self, number):
+        """
+        Send ray through board at given marker number without changing markers or score.
+
+        Returns the same value as beam: 'R', 'H', or number of exit.
+        """
+
+        outcome = self.outcome(number)
+        if outcome > 0:
+            return outcome
+        return 'H' if outcome == HIT else 'R'
+
+    def outcome(self, number):
+        """
+        Returns the outcome code of a ray sent from the given marker, without changing markers or score.
+
+        Codes are HIT, REFLECTION, EDGE for a reflection at the point of entry, or the number of exit.
+        Precomputed outcomes are used if the board has them (see: reset).
+        """
+
+        if self.outcomes is not None:
+            return self.outcomes[number]
+        return self.shoot(Ray(number, self.topology))
+
+    def shoot(self, ray, path=None, count=False):
+        """
+        Send given ray through board. Returns its outcome code (see: outcome).
+
+        If a set is given as 'path', the spaces the outcome depends on are added to it: those beside the
+        point of entry and those the ray crossed (see: survey). If 'count' is True, the steps and turns
+        taken are left on the ray (see: travel).
+        """
 
         # Check for edgecase reflection immediately
+        if path is not None:
+            path.update(self.topology.sides[ray.origin])
         if self.reflection(ray) is True:
-            result = 'R'
-            self.setmarker(number, result, end)
-            return result
+            return EDGE
+
+        result, end = self.travel(ray, path, count)
+
+        # Hit or reflection means end is not set
+        if end != 0:
+            return end
+        return HIT if result == 'H' else REFLECTION
+
+    def travel(self, ray, path=None, count=False):
+        """
+        Move ray through board until interruption. If 'count' is True, the number of steps and turns taken
+        are left on the ray. The spaces crossed are added to 'path' if a set is given.
+
+        Rays are traced through the topology's tables, so the same loop serves every board shape.
+        Returns a tuple of the ray's result ('H', 'R' or 'null') and the number of its exit, or 0.
+
+        A ray cannot cross the same space in the same direction twice without going round forever, so
+        one taking more steps than there are spaces and directions is trapped, and counts as reflected.
+        """
+
+        # Alias tables
+        fields = self.fields
+        step = self.topology.step
+        turn = self.topology.turn
+        directions = self.topology.directions
+        mirror = self.topology.mirror
+
+        cell = ray.cell
+        direction = ray.direction
+        result = 'null'
+        end = 0
+        turns = 0
+
+        # Nothing to count or record, so only follow the ray
+        if count is False and path is None:
+            for steps in range(len(step)):
+                field = fields[cell]
+                if field == ATOM:
+                    result = 'H'
+                    break
+                if field == mirror:
+                    result = 'R'
+                    break
+                direction = turn[field * directions + direction]
+                cell = step[cell * directions + direction]
+                if cell < 0:
+                    end = -cell
+                    break
+            else:
+                result = 'R'
+
+            ray.cell = cell
+            ray.direction = direction
+            return result, end
 
         # Check spaces in a straight path until interruption
-        while True:
-            check = self.check(ray.x, ray.y)
+        for steps in range(len(step)):
+            if path is not None:
+                path.add(cell)
+            field = fields[cell]
 
             # Ray encounters atom
-            if check == 9:
+            if field == ATOM:
                 result = 'H'
                 break
 
             # Ray reflects
-            if check == 5:
+            if field == mirror:
                 result = 'R'
                 break
 
-            # Ray encounters field
-            if 0 < check < 5:
-                ray.turn(check)
+            # Ray turns if it encounters a corner field
+            turned = turn[field * directions + direction]
+            if turned != direction:
+                direction = turned
+                turns += 1
+
+            # Advance ray forward, checking if it has left the board
+            cell = step[cell * directions + direction]
+            if cell < 0:
+                steps += 1
+                end = -cell
+                break
+
+        # Ray is trapped
+        else:
+            steps = len(step)
+            result = 'R'
+
+        ray.cell = cell
+        ray.direction = direction
+        ray.steps = steps
+        ray.turns = turns
+        return result, end
 
-            # Advance ray forward
-            # Must be done before edge check
-            ray.advance()
+    def survey(self):
+        """
+        Trace every marker, filling in outcomes and the paths they depend on, so that later layout changes
+        only retrace the rays they touch (see: update).
+        """
 
-            # Check if ray has hit edge of board
-            if ray.edge() != 'null':
-                end = ray.edge()
-                break
+        self.outcomes = [None]
+        self.paths = [None]
+        for number in range(1, self.topology.markers + 1):
+            path = set()
+            self.outcomes.append(self.shoot(Ray(number, self.topology), path))
+            self.paths.append(path)
 
-        # Return result, add to score, and change markers
-        self.setmarker(number, result, end)
+    def retrace(self, changed):
+        """
+        Bring outcomes up to date after fields changed at the given spaces, retracing only rays whose
+        paths cross them. Every marker is traced if paths are not known (see: survey). Boards without
+        outcomes trace rays as they are sent, so there is nothing to bring up to date.
+        """
 
-        # Hit or reflection means end is not set
-        if end != 0:
-            self.score += 2
-            return end
-        else:
-            self.score += 1
-            return result
+        if self.outcomes is None:
+            return
+        if self.paths is None:
+            self.survey()
+            return
+
+        outcomes = self.outcomes
+        paths = self.paths
+        for number in range(1, self.topology.markers + 1):
+            if not paths[number].isdisjoint(changed):
+                paths[number] = set()
+                outcomes[number] = self.shoot(Ray(number, self.topology), paths[number])
 
     def guess(self, x, y):
         """
@@ -401,6 +676,16 @@ class Board:
         Returns 2 if all guesses have already been used.
         """
 
+        result = self.toggle(x, y)
+        if self.log is not None:
+            self.log.guess(x, y, result)
+        if self.stats is not None:
+            self.stats.guesses += 1
+        return result
+
+    def toggle(self, x, y):
+        """Toggles guess at given coordinates. Returns the same values as guess."""
+
         # Toggle guess if present
         if (x, y) in self.guesslist:
             self.guesslist.remove((x, y))
@@ -442,4 +727,6 @@ class Board:
                 correct += 1
 
         self.game_over = True
+        if self.log is not None:
+            self.log.endscore(correct, self.score)
         return correct
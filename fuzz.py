@@ -0,0 +1,513 @@
+import argparse
+import signal
+from multiprocessing import Pool
+from random import Random
+from time import perf_counter
+
+from config import dimension, SHAPE
+from engine import Board, Ray
+from topology import get
+
+# Engines under test, keyed by name. Each plays a layout and a guess sequence (see: play).
+engines = {}
+
+# Every engine is compared against this one
+REFERENCE = 'board'
+
+
+def register(name):
+    """Decorator registering an engine function: engine(atomlist, guesses) returns a list of (label, value)."""
+
+    def decorate(function):
+        engines[name] = function
+        return function
+
+    return decorate
+
+
+def play(board, guesses):
+    """
+    Beam every marker in order, then make every guess and score the game. Returns everything observable
+    as a list of (label, value): beam results, marker symbols and links, scores and guess results.
+    """
+
+    markers = board.topology.markers
+    observed = []
+
+    for number in range(1, markers + 1):
+        observed.append(('beam %d' % number, board.beam(number)))
+    for number in range(1, markers + 1):
+        marker = board.markers[number]
+        observed.append(('marker %d' % number, (marker.symbol, marker.link)))
+    observed.append(('score', board.score))
+
+    for x, y in guesses:
+        observed.append(('guess %d %d' % (x, y), board.guess(x, y)))
+    observed.append(('correct', board.endscore()))
+    observed.append(('final score', board.score))
+
+    return observed
+
+
+# Boards reused across cases within a process
+boards = {}
+
+
+def scratch(name):
+    """Returns this process's board for the named engine."""
+
+    if name not in boards:
+        boards[name] = Board()
+    return boards[name]
+
+
+@register('board')
+def reference(atomlist, guesses):
+    """The engine as shipped."""
+
+    board = scratch('board')
+    board.reset(atomlist=atomlist)
+    return play(board, guesses)
+
+
+@register('outcomes')
+def outcomes(atomlist, guesses):
+    """Beams answered from a precomputed outcome table and fields, as loaded from puzzle packs."""
+
+    source = scratch('source')
+    source.reset(atomlist=atomlist)
+    table = [None] + [source.outcome(number) for number in range(1, source.topology.markers + 1)]
+
+    board = scratch('outcomes')
+    board.reset(atomlist=atomlist, fields=source.fields, outcomes=table)
+    return play(board, guesses)
+
+
+@register('incremental')
+def incremental(atomlist, guesses):
+    """
+    Reaches the layout by editing another one (see: Board.move_atom), so outcomes come from
+    incremental updates: an extra atom is removed, the last atom added and the first moved into place.
+    """
+
+    board = scratch('incremental')
+    if not atomlist:
+        board.reset(atomlist=atomlist)
+        return play(board, guesses)
+
+    random = Random(str(atomlist))
+    free = [board.topology.cells[site] for site in board.topology.sites
+            if board.topology.cells[site] not in atomlist]
+    extra, moved = random.sample(free, 2)
+
+    board.reset(atomlist=[extra, moved] + list(atomlist[1:-1]))
+    board.survey()
+    board.remove_atom(extra)
+    board.add_atom(atomlist[-1])
+    if len(atomlist) > 1:
+        board.move_atom(moved, atomlist[0])
+    else:
+        board.remove_atom(moved)
+    return play(board, guesses)
+
+
+class Legacy:
+    """
+    The square engine's original rules, written out directly with coordinates and if-chains.
+    Kept as an independent oracle for the table-driven engine (see: topology.py).
+    """
+
+    def __init__(self, atomlist):
+        self.atomlist = list(atomlist)
+        self.guesslist = []
+        self.symbols = [ord('@')]
+        self.score = 0
+        self.markers = {number: [None, None] for number in range(1, dimension * 4 + 1)}
+        self.fields = {(x, y): 0 for x in range(dimension) for y in range(dimension)}
+
+        for x, y in self.atomlist:
+            self.field(x + 1, y + 1, 1)
+            self.field(x - 1, y + 1, 2)
+            self.field(x - 1, y - 1, 3)
+            self.field(x + 1, y - 1, 4)
+        for x, y in self.atomlist:
+            for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                self.field(cell[0], cell[1], 6)
+
+    def field(self, x, y, quad):
+        if (x, y) not in self.fields:
+            return
+        if 0 < self.fields[(x, y)] < 5 and quad != 6:
+            self.fields[(x, y)] = 5
+        else:
+            self.fields[(x, y)] = quad
+
+    def check(self, x, y):
+        if (x, y) not in self.fields:
+            return 0
+        if (x, y) in self.atomlist:
+            return 9
+        return self.fields[(x, y)]
+
+    def setmarker(self, origin, result, end=0):
+        if end != 0:
+            letter = chr(self.symbols[-1] + 1)
+            while letter == 'R' or letter == 'H':
+                letter = chr(ord(letter) + 1)
+            self.symbols.append(ord(letter))
+            self.symbols.append(ord(letter))
+            self.markers[origin] = [letter, end]
+            self.markers[end] = [letter, origin]
+        else:
+            self.markers[origin][0] = result
+
+    def beam(self, number):
+        n = dimension
+        if number <= n:
+            direction, x, y = 'e', 0, n - number
+        elif number <= 2 * n:
+            direction, x, y = 'n', number - n - 1, 0
+        elif number <= 3 * n:
+            direction, x, y = 'w', n - 1, number - 2 * n - 1
+        else:
+            direction, x, y = 's', 4 * n - number, n - 1
+
+        # Immediate reflection
+        if direction in 'ew':
+            sides = ((x, y + 1), (x, y - 1))
+        else:
+            sides = ((x + 1, y), (x - 1, y))
+        if any(self.check(*side) == 9 for side in sides):
+            self.setmarker(number, 'R')
+            return 'R'
+
+        turns = {
+            (1, 'w'): 'n', (1, 's'): 'e', (2, 'e'): 'n', (2, 's'): 'w',
+            (3, 'e'): 's', (3, 'n'): 'w', (4, 'n'): 'e', (4, 'w'): 's',
+        }
+        moves = {'e': (1, 0), 'n': (0, 1), 'w': (-1, 0), 's': (0, -1)}
+
+        while True:
+            check = self.check(x, y)
+            if check == 9 or check == 5:
+                result = 'H' if check == 9 else 'R'
+                self.setmarker(number, result)
+                self.score += 1
+                return result
+
+            direction = turns.get((check, direction), direction)
+            dx, dy = moves[direction]
+            x, y = x + dx, y + dy
+
+            end = 0
+            if x < 0:
+                end = n - y
+            elif x >= n:
+                end = y + 1 + 2 * n
+            elif y < 0:
+                end = x + 1 + n
+            elif y >= n:
+                end = 4 * n - x
+            if end != 0:
+                self.setmarker(number, 'null', end)
+                self.score += 2
+                return end
+
+    def guess(self, x, y):
+        if (x, y) in self.guesslist:
+            self.guesslist.remove((x, y))
+            return 0
+        if len(self.guesslist) == len(self.atomlist):
+            return 2
+        if (x, y) not in self.fields:
+            return 1
+        self.guesslist.append((x, y))
+        return 0
+
+    def endscore(self):
+        correct = 0
+        for guess in self.guesslist:
+            if guess in self.atomlist:
+                correct += 1
+            else:
+                self.score += 5
+        return correct
+
+
+@register('legacy')
+def legacy(atomlist, guesses):
+    """The original square rules (see: Legacy)."""
+
+    board = Legacy(atomlist)
+    markers = dimension * 4
+    observed = []
+
+    for number in range(1, markers + 1):
+        observed.append(('beam %d' % number, board.beam(number)))
+    for number in range(1, markers + 1):
+        observed.append(('marker %d' % number, tuple(board.markers[number])))
+    observed.append(('score', board.score))
+
+    for x, y in guesses:
+        observed.append(('guess %d %d' % (x, y), board.guess(x, y)))
+    observed.append(('correct', board.endscore()))
+    observed.append(('final score', board.score))
+
+    return observed
+
+
+def layout(random, topology):
+    """
+    Returns a random atom layout, with guesses. Besides uniform layouts, some are adversarial:
+    atoms along the edge, clusters of adjacent atoms, and atoms arranged to form mirrors.
+    """
+
+    sites = [topology.cells[site] for site in topology.sites]
+    kind = random.randrange(5)
+    count = random.randint(1, 8)
+
+    if kind == 0:
+        # Uniform
+        atomlist = random.sample(sites, min(count, len(sites)))
+
+    elif kind == 1:
+        # Edge atoms
+        edge = [cell for cell in sites if any(
+            topology.step[topology.index[cell] * topology.directions + direction] < 0
+            or topology.step[topology.index[cell] * topology.directions + direction] not in topology.sites
+            for direction in range(topology.directions))]
+        atomlist = random.sample(edge, min(count, len(edge)))
+
+    elif kind == 2:
+        # Adjacent atoms, grown as a random cluster
+        cell = topology.index[random.choice(sites)]
+        cluster = [cell]
+        for i in range(count * 4):
+            following = topology.step[random.choice(cluster) * topology.directions
+                                      + random.randrange(topology.directions)]
+            if following >= 0 and following in topology.sites and following not in cluster:
+                cluster.append(following)
+            if len(cluster) == count:
+                break
+        atomlist = [topology.cells[cell] for cell in cluster]
+
+    elif kind == 3:
+        # Atoms whose corner fields overlap, making mirrors
+        atomlist = []
+        for i in range(count):
+            cell = topology.index[random.choice(sites)]
+            atomlist.append(topology.cells[cell])
+            for target, field in random.sample(topology.corners[cell], min(2, len(topology.corners[cell]))):
+                for other, other_field in topology.corners[target]:
+                    if other_field == field and topology.cells[other] in sites:
+                        atomlist.append(topology.cells[other])
+        atomlist = list(dict.fromkeys(atomlist))[:8]
+
+    else:
+        # Crowded board
+        atomlist = random.sample(sites, min(random.randint(8, 16), len(sites)))
+
+    # Guesses: some atoms, some misses, toggles and off-board guesses
+    guesses = []
+    for i in range(random.randint(0, len(atomlist) + 3)):
+        choice = random.randrange(4)
+        if choice == 0 and atomlist:
+            guesses.append(random.choice(atomlist))
+        elif choice == 1 and guesses:
+            guesses.append(random.choice(guesses))
+        elif choice == 2:
+            guesses.append((random.randint(-1, dimension), random.randint(-1, dimension)))
+        else:
+            guesses.append(random.choice(topology.cells))
+
+    return atomlist, guesses
+
+
+def properties(atomlist):
+    """
+    Check rules every engine must keep on any board shape, using the reference board: no ray may be
+    trapped, and a ray leaving at another marker must come back when sent from there.
+    Returns the first ray breaking them as (engine, label, expected, actual), or None.
+    """
+
+    board = scratch('properties')
+    board.reset(atomlist=atomlist)
+    topology = board.topology
+
+    exits = [None]
+    for number in range(1, topology.markers + 1):
+        ray = Ray(number, topology)
+        exits.append(board.shoot(ray, count=True))
+        if ray.steps >= len(topology.step):
+            return REFERENCE, 'beam %d' % number, 'to end', 'trapped'
+
+    for number in range(1, topology.markers + 1):
+        end = exits[number]
+        if end > 0 and exits[end] != number:
+            return REFERENCE, 'beam %d back from %d' % (end, number), number, exits[end]
+
+    return None
+
+
+class Timeout(Exception):
+    """Raised in an engine running out of time (see: attempt)."""
+
+
+def expire(signum, frame):
+    raise Timeout()
+
+
+def attempt(function, timeout, *args):
+    """
+    Call function(*args), stopping it after 'timeout' seconds where timers are available.
+    Returns a tuple of its result and None, or of None and what went wrong.
+    """
+
+    timed = timeout is not None and hasattr(signal, 'setitimer')
+    if timed:
+        signal.signal(signal.SIGALRM, expire)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        return function(*args), None
+    except Timeout:
+        return None, 'timed out after %g s' % timeout
+    except Exception as exception:
+        return None, 'raised %r' % exception
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def compare(atomlist, guesses, names, timeout=None):
+    """
+    Returns the first divergence as (engine, label, expected, actual), or None. An engine diverges if it
+    disagrees with the reference, raises, or runs past 'timeout' seconds. The reference must also keep
+    the rules of every board (see: properties).
+    """
+
+    expected, error = attempt(engines[REFERENCE], timeout, atomlist, guesses)
+    if error is None:
+        broken, error = attempt(properties, timeout, atomlist)
+        if broken is not None:
+            return broken
+    if error is not None:
+        return REFERENCE, 'run', 'to finish', error
+
+    for name in names:
+        actual, error = attempt(engines[name], timeout, atomlist, guesses)
+        if error is not None:
+            return name, 'run', 'to finish', error
+
+        for (label, value), (other_label, other) in zip(expected, actual):
+            if label != other_label or value != other:
+                return name, label, value, other
+        if len(expected) != len(actual):
+            return name, 'length', len(expected), len(actual)
+    return None
+
+
+def minimize(atomlist, guesses, names, timeout=None):
+    """Shrink a diverging case by dropping atoms and guesses while it still diverges."""
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(atomlist)):
+            smaller = atomlist[:i] + atomlist[i + 1:]
+            if compare(smaller, guesses, names, timeout) is not None:
+                atomlist = smaller
+                changed = True
+                break
+        for i in range(len(guesses)):
+            smaller = guesses[:i] + guesses[i + 1:]
+            if compare(atomlist, smaller, names, timeout) is not None:
+                guesses = smaller
+                changed = True
+                break
+
+    return atomlist, guesses
+
+
+def case(seed, number):
+    """Returns the layout and guesses of the given case, reproducibly."""
+
+    return layout(Random((seed << 32) | number), get(SHAPE, dimension))
+
+
+def run(job):
+    """Run a range of cases. Returns the number run and the first diverging case number, or None."""
+
+    seed, start, stop, names, timeout = job
+    for number in range(start, stop):
+        atomlist, guesses = case(seed, number)
+        if compare(atomlist, guesses, names, timeout) is not None:
+            return number - start + 1, number
+    return stop - start, None
+
+
+def draw(atomlist, guesses):
+    """Returns a drawing of a square layout: atoms as O, guesses as X, both as @."""
+
+    rows = []
+    for y in reversed(range(dimension)):
+        row = ''
+        for x in range(dimension):
+            atom = (x, y) in atomlist
+            guess = (x, y) in guesses
+            row += '@' if atom and guess else 'O' if atom else 'X' if guess else '.'
+        rows.append(row)
+    return '\n'.join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Differential fuzzing of engines against the reference engine.')
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='defaults to one per CPU')
+    parser.add_argument('--chunk', type=int, default=500, help='cases per job')
+    parser.add_argument('--engines', nargs='*', help='engines to test (default: all)')
+    parser.add_argument('--timeout', type=float, default=2.0, help='seconds an engine may take per case')
+    options = parser.parse_args()
+
+    names = options.engines or [name for name in engines if name != REFERENCE]
+    if SHAPE != 'SQUARE' and 'legacy' in names:
+        names.remove('legacy')
+
+    jobs = [(options.seed, start, min(start + options.chunk, options.cases), names, options.timeout)
+            for start in range(0, options.cases, options.chunk)]
+
+    started = perf_counter()
+    ran = 0
+    failures = []
+    with Pool(options.processes) as pool:
+        for count, failure in pool.imap(run, jobs):
+            ran += count
+            if failure is not None:
+                failures.append(failure)
+                pool.terminate()
+                break
+    elapsed = perf_counter() - started
+
+    print('%d cases against %s in %.1f s (%.0f cases/min)' % (ran, ', '.join(names), elapsed, ran / elapsed * 60))
+
+    if not failures:
+        print('no divergence')
+        return
+
+    number = min(failures)
+    atomlist, guesses = case(options.seed, number)
+    atomlist, guesses = minimize(atomlist, guesses, names, options.timeout)
+    name, label, expected, actual = compare(atomlist, guesses, names, options.timeout)
+
+    print('divergence in case %d (--seed %d), minimized:' % (number, options.seed))
+    print('engine %s, %s: expected %r, got %r' % (name, label, expected, actual))
+    print('atoms', atomlist)
+    print('guesses', guesses)
+    if SHAPE == 'SQUARE':
+        print(draw(atomlist, guesses))
+    raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
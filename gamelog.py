@@ -0,0 +1,209 @@
+import mmap
+import re
+import struct
+import sys
+from time import time
+
+from config import dimension, SHAPE
+from engine import Board
+from topology import get
+
+# Spaces are logged by number
+topology = get(SHAPE, dimension)
+
+# Most atoms a RESET or RESUME record holds
+ATOMS = 8
+
+# Fixed-width record: timestamp, game, kind, argument, value, payload
+RECORD = struct.Struct('<dIBBh%ds' % ATOMS)
+KIND = 12
+
+# Record kinds
+RESET = 1     # argument: number of atoms, payload: atom space numbers
+BEAM = 2      # argument: marker number, value: exit marker number, or HIT / REFLECTION
+GUESS = 3     # argument: space number or PAD, value: result of Board.guess
+END = 4       # argument: atoms correct, value: final score
+RESUME = 5    # as RESET, for a game restored mid-way (see: snapshot.py), value: score so far
+
+# Records starting a game
+STARTS = re.compile(b'[%c%c]' % (RESET, RESUME))
+
+HIT = -1
+REFLECTION = -2
+
+# Unused payload bytes
+PAD = 0xFF
+
+
+class GameLog:
+    """
+    Append-only binary log of game events, written by the engine (see: Board.log).
+
+    Every event is one fixed-width record, so logs can be read back without parsing. Writes are buffered,
+    and only reach the file once the buffer fills, or on flush or close.
+    """
+
+    def __init__(self, path, buffering=RECORD.size * 256):
+        """Open log at path for appending. Raises ValueError if spaces cannot be logged by number."""
+
+        if len(topology.cells) > PAD:
+            raise ValueError('cannot log boards of more than %d spaces' % PAD)
+
+        self.file = open(path, 'ab', buffering=buffering)
+        self.game = 0
+
+    def write(self, kind, argument=0, value=0, payload=b''):
+        """Append a record to the log."""
+
+        self.file.write(RECORD.pack(time(), self.game, kind, argument, value, payload))
+
+    def reset(self, atomlist):
+        """Log the start of a new game with the given atoms. Raises ValueError if there are too many to log."""
+
+        self.game += 1
+        self.write(RESET, len(atomlist), 0, self.payload(atomlist))
+
+    def resume(self, atomlist, score, guesslist):
+        """
+        Log a game restored part way through, with its atoms, score and guesses. Earlier beams are not
+        logged again; replays start from the score instead.
+        """
+
+        self.game += 1
+        self.write(RESUME, len(atomlist), score, self.payload(atomlist))
+        for x, y in guesslist:
+            self.guess(x, y, 0)
+
+    def payload(self, atomlist):
+        """Returns the payload of atom space numbers for the given atoms."""
+
+        if len(atomlist) > ATOMS:
+            raise ValueError('cannot log more than %d atoms' % ATOMS)
+        cells = bytes(topology.index[atom] for atom in atomlist)
+        return cells.ljust(ATOMS, bytes([PAD]))
+
+    def beam(self, number, result):
+        """Log a beam and its result ('R', 'H', or number of exit)."""
+
+        if result == 'H':
+            result = HIT
+        elif result == 'R':
+            result = REFLECTION
+        self.write(BEAM, number, result)
+
+    def guess(self, x, y, result):
+        """Log a guess at given coordinates and its result. Guesses off the board are logged as PAD."""
+
+        self.write(GUESS, topology.index.get((x, y), PAD), result)
+
+    def endscore(self, correct, score):
+        """Log the end of a game."""
+
+        self.write(END, correct, score)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Game:
+    """
+    One logged game: a view of its records in a memory-mapped log. Nothing is decoded until it is asked for.
+    """
+
+    def __init__(self, view):
+        self.view = view
+
+    def __len__(self):
+        return len(self.view) // RECORD.size
+
+    def records(self):
+        """Iterate over the game's records as tuples (see: RECORD)."""
+
+        return RECORD.iter_unpack(self.view)
+
+    def layout(self):
+        """Returns list of the coordinates of the game's atoms."""
+
+        (_, _, _, count, _, cells) = RECORD.unpack_from(self.view)
+        return [topology.cells[cell] for cell in cells[:count]]
+
+    def replay(self, board=None):
+        """
+        Play the game's events through a Board and return it.
+
+        Beams and guesses are replayed under the engine's current rules, so the board's score
+        may differ from the logged one if the rules changed.
+        """
+
+        if board is None:
+            board = Board()
+        board.reset(atomlist=self.layout())
+
+        # Restored games start from their score so far
+        (_, _, kind, _, value, _) = RECORD.unpack_from(self.view)
+        if kind == RESUME:
+            board.score = value
+
+        for (_, _, kind, argument, value, _) in self.records():
+            if kind == BEAM:
+                board.beam(argument)
+            elif kind == GUESS and argument != PAD:
+                board.guess(*topology.cells[argument])
+            elif kind == END:
+                board.endscore()
+
+        return board
+
+
+class Corpus:
+    """
+    Memory-mapped collection of game logs, iterated game by game without copying records.
+    """
+
+    def __init__(self, paths):
+        """Map the logs at the given paths. Partial trailing records, if any, are ignored."""
+
+        self.maps = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                try:
+                    self.maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                except ValueError:
+                    # Empty log
+                    continue
+
+    def games(self):
+        """Iterate over every game in the corpus (see: Game). Events logged before a game's start are skipped."""
+
+        size = RECORD.size
+        for log in self.maps:
+            view = memoryview(log)[:len(log) // size * size]
+
+            # Find game boundaries by scanning only the kind byte of each record
+            kinds = view[KIND::size].tobytes()
+            starts = [match.start() for match in STARTS.finditer(kinds)]
+            for start, stop in zip(starts, starts[1:] + [len(kinds)]):
+                yield Game(view[start * size:stop * size])
+
+    def close(self):
+        for log in self.maps:
+            log.close()
+        self.maps = []
+
+
+if __name__ == '__main__':
+    # Re-score every game in the given logs under the current rules
+    corpus = Corpus(sys.argv[1:])
+    board = Board()
+    games = 0
+    total = 0
+    for game in corpus.games():
+        total += game.replay(board).score
+        games += 1
+
+    print(games, 'games')
+    if games > 0:
+        print('mean score', total / games)
@@ -0,0 +1,188 @@
+from math import exp
+from random import choice, random, randrange, sample
+from time import perf_counter
+
+from config import atoms
+from engine import Board
+
+
+class Heatmap:
+    """
+    Estimates the probability that each board space holds an atom, given the beam results seen so far.
+
+    Exact marginals over every layout consistent with the results are too expensive to compute after
+    each beam, so layouts are sampled instead. A Markov chain moves one atom at a time and keeps the
+    most recent consistent layouts. When a new result comes in, samples that contradict it are dropped
+    and the chain continues from where it was, so the estimate is refined incrementally within a time
+    budget rather than rebuilt.
+    """
+
+    def __init__(self, samples=512, budget=0.02):
+        """
+        'samples'   Number of consistent layouts kept for the estimate.
+        'budget'    Seconds spent sampling per update.
+        """
+
+        self.size = samples
+        self.budget = budget
+
+        # Scratch board for testing layouts, and the spaces atoms may occupy (see: Board.reset)
+        self.board = Board()
+        topology = self.board.topology
+        self.cells = [topology.cells[site] for site in topology.sites]
+
+        self.observations = {}
+        self.pending = []
+        self.fresh = False
+
+        self.samples = []
+        self.counts = {}
+        self.shown = {}
+
+        self.layout = None
+        self.misses = 0
+
+        self.clear()
+
+    def clear(self):
+        """Forget all results and samples."""
+
+        self.observations = {}
+        self.samples = []
+        self.counts = {cell: 0 for cell in self.cells}
+        self.layout = sample(self.cells, atoms)
+        self.misses = 0
+
+    def reset(self):
+        """Start over for a new game. Takes effect on the next update, so it is safe to call while one is running."""
+
+        self.pending = []
+        self.fresh = True
+
+    def observe(self, number, outcome):
+        """Record the outcome of a beam ('R', 'H', or number of exit). Takes effect on the next update."""
+
+        self.pending.append((number, outcome))
+
+    def update(self, budget=None):
+        """Fold in new results and sample for the given number of seconds. Returns probabilities (see: probabilities)."""
+
+        if budget is None:
+            budget = self.budget
+        deadline = perf_counter() + budget
+
+        if self.fresh is True:
+            self.fresh = False
+            self.clear()
+
+        # Drop samples contradicted by new results
+        if self.pending:
+            new, self.pending = self.pending, []
+            for number, outcome in new:
+                self.observations[number] = outcome
+
+            kept = [layout for layout in self.samples if self.test(layout, new) == 0]
+            self.samples = []
+            self.counts = {cell: 0 for cell in self.cells}
+            for layout in kept:
+                self.keep(layout)
+            self.misses = self.test(self.layout, self.observations.items())
+
+        # Advance the chain until out of time
+        while perf_counter() < deadline:
+            self.step()
+
+        return self.probabilities()
+
+    def place(self, layout):
+        """
+        Set the scratch board to the given layout. Layouts one move apart, as the chain produces, are
+        reached by moving a single atom, so only the fields around it are recomputed (see: Board.move_atom).
+        Anything else is rebuilt in full. The board keeps no outcome table, so only observed rays are traced.
+        """
+
+        board = self.board
+        moves = [(old, new) for old, new in zip(board.atomlist, layout) if old != new]
+
+        if len(moves) == 1 and len(board.atomlist) == len(layout):
+            board.move_atom(*moves[0])
+        elif moves or len(board.atomlist) != len(layout):
+            board.atomlist = list(layout)
+            board.populate()
+
+    def test(self, layout, observations):
+        """Returns the number of observations the given layout contradicts."""
+
+        board = self.board
+        self.place(layout)
+
+        misses = 0
+        for number, outcome in observations:
+            if board.trace(number) != outcome:
+                misses += 1
+        return misses
+
+    def step(self):
+        """Move a random atom to a random empty space, favouring layouts that contradict fewer results."""
+
+        layout = list(self.layout)
+        while True:
+            cell = choice(self.cells)
+            if cell not in layout:
+                break
+        layout[randrange(atoms)] = cell
+
+        misses = self.test(layout, self.observations.items())
+
+        # Always accept moves that are no worse, so consistent layouts are sampled uniformly
+        if misses <= self.misses or random() < exp(3 * (self.misses - misses)):
+            self.layout = layout
+            self.misses = misses
+        else:
+            self.place(self.layout)
+
+        if self.misses == 0:
+            self.keep(self.layout)
+
+    def keep(self, layout):
+        """Add a consistent layout to the samples, dropping the oldest if full."""
+
+        if len(self.samples) == self.size:
+            for cell in self.samples.pop(0):
+                self.counts[cell] -= 1
+
+        self.samples.append(layout)
+        for cell in layout:
+            self.counts[cell] += 1
+
+    def probabilities(self):
+        """Returns dict of atom probabilities, keyed by space number."""
+
+        probabilities = {}
+        total = len(self.samples)
+
+        for number, cell in enumerate(self.board.topology.cells):
+            if cell not in self.counts:
+                probabilities[number] = 0.0
+            # No samples yet, fall back on the prior
+            elif total == 0:
+                probabilities[number] = atoms / len(self.cells)
+            else:
+                probabilities[number] = self.counts[cell] / total
+
+        return probabilities
+
+    def changes(self, probabilities, threshold=0.05):
+        """Returns the probabilities that changed by more than threshold since they were last returned."""
+
+        changed = {}
+        for number, probability in probabilities.items():
+            if abs(probability - self.shown.get(number, -1)) > threshold:
+                changed[number] = probability
+                self.shown[number] = probability
+        return changed
+
+    def forget(self):
+        """Forget which probabilities were last shown, so the next call to changes returns all of them."""
+
+        self.shown = {}
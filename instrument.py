@@ -0,0 +1,162 @@
+import json
+import sys
+from threading import Timer
+from time import time
+
+from engine import Board
+
+
+class Histogram:
+    """
+    Latency histogram with power of two buckets, in nanoseconds. Bucket n counts latencies below 2 ** n.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total = 0
+
+    def add(self, ns):
+        self.buckets[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given fraction's percentile, or 0 if empty."""
+
+        if self.count == 0:
+            return 0
+
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return 2 ** bucket
+        return 2 ** 63
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total // self.count if self.count else 0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+        }
+
+
+class Stats:
+    """
+    Counters and latency histograms for the game engine.
+
+    Boards report to the Stats enabled on them (see: enable). While disabled, the engine only pays for
+    a check of Board.stats per reset and beam, and two counters kept in locals on the ray loop.
+    """
+
+    def __init__(self):
+        self.resets = 0
+        self.beams = 0
+        self.hits = 0
+        self.reflections = 0
+        self.edge_reflections = 0
+        self.exits = 0
+        self.steps = 0
+        self.turns = 0
+        self.guesses = 0
+        self.reset_latency = Histogram()
+        self.beam_latency = Histogram()
+        self.timer = None
+
+    def reset(self, ns):
+        """Called by Board.reset."""
+
+        self.resets += 1
+        self.reset_latency.add(ns)
+
+    def beam(self, ns, result, steps, turns, edge=False):
+        """Called by Board.beam."""
+
+        self.beams += 1
+        self.beam_latency.add(ns)
+        self.steps += steps
+        self.turns += turns
+
+        if result == 'H':
+            self.hits += 1
+        elif result == 'R':
+            self.reflections += 1
+            if edge is True:
+                self.edge_reflections += 1
+        else:
+            self.exits += 1
+
+    def snapshot(self):
+        """Returns dict of all counters and latency summaries."""
+
+        beams = self.beams or 1
+        return {
+            'time': time(),
+            'resets': self.resets,
+            'beams': self.beams,
+            'hits': self.hits,
+            'reflections': self.reflections,
+            'edge_reflections': self.edge_reflections,
+            'exits': self.exits,
+            'guesses': self.guesses,
+            'steps': self.steps,
+            'turns': self.turns,
+            'steps_per_beam': self.steps / beams,
+            'turns_per_beam': self.turns / beams,
+            'reset_ns': self.reset_latency.snapshot(),
+            'beam_ns': self.beam_latency.snapshot(),
+        }
+
+    def dump(self, stream=None):
+        """Write snapshot to stream as one line of JSON, defaulting to stderr."""
+
+        if stream is None:
+            stream = sys.stderr
+        stream.write(json.dumps(self.snapshot()) + '\n')
+        stream.flush()
+
+    def start(self, interval, stream=None):
+        """Dump a snapshot every interval seconds until stopped."""
+
+        def tick():
+            if self.timer is None:
+                return
+            self.dump(stream)
+            self.start(interval, stream)
+
+        self.timer = Timer(interval, tick)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def stop(self):
+        """Stop periodic dumps."""
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
+def enable(stats=None, board=None):
+    """Enable instrumentation on the given board, or on all boards. Returns the Stats reported to."""
+
+    if stats is None:
+        stats = Stats()
+
+    if board is None:
+        Board.stats = stats
+    else:
+        board.stats = stats
+    return stats
+
+
+def disable(board=None):
+    """Disable instrumentation on the given board, or on all boards."""
+
+    if board is None:
+        Board.stats = None
+    else:
+        board.stats = None
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import random
+from time import perf_counter
+
+from config import dimension, atoms, SHAPE
+from topology import get
+
+
+async def client(host, port, deadline, latencies):
+    """Play random games against the server until the deadline, recording the latency of every request."""
+
+    topology = get(SHAPE, dimension)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def request(line):
+        start = perf_counter()
+        writer.write(line.encode('ascii') + b'\n')
+        reply = await reader.readline()
+        latencies.append(perf_counter() - start)
+        if not reply.startswith(b'OK'):
+            raise RuntimeError(line + ': ' + reply.decode('ascii').strip())
+        return reply
+
+    try:
+        while perf_counter() < deadline:
+            await request('NEW')
+
+            # Beam unused markers only. Rays that leave the board use up their exit marker too.
+            used = set()
+            for number in random.sample(range(1, topology.markers + 1), 8):
+                if number in used:
+                    continue
+                result = (await request('BEAM ' + str(number))).split()[1]
+                used.add(number)
+                if result.isdigit():
+                    used.add(int(result))
+            for i in range(atoms):
+                x, y = random.choice(topology.cells)
+                await request('GUESS ' + str(x) + ' ' + str(y))
+            await request('END')
+    finally:
+        writer.write(b'QUIT\n')
+        writer.close()
+
+
+def percentile(ordered, fraction):
+    """Returns the given fraction's percentile of a sorted list."""
+
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(host, port, clients, seconds):
+    latencies = []
+    start = perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(client(host, port, deadline, latencies) for i in range(clients)))
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    print(clients, 'clients,', len(latencies), 'requests in', round(elapsed, 2), 's')
+    print('requests/s', round(len(latencies) / elapsed))
+    for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999)):
+        print(label, round(percentile(latencies, fraction) * 1000, 3), 'ms')
+    print('max', round(latencies[-1] * 1000, 3), 'ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate load against a local game server (see: server.py).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--clients', type=int, default=100, help='concurrent connections')
+    parser.add_argument('--seconds', type=float, default=10)
+    options = parser.parse_args()
+
+    asyncio.run(run(options.host, options.port, options.clients, options.seconds))
+
+
+if __name__ == '__main__':
+    main()
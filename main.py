@@ -1,5 +1,6 @@
 import kivy
 import datetime
+import os
 import platform
 from kivy.app import App
 from kivy.core.window import Window
@@ -11,8 +12,14 @@ from kivy.utils import get_color_from_hex
 from kivy.lang import Builder
 from kivy.atlas import Atlas
 
-from config import atoms
+from config import atoms, heatmap, log, profile
 from engine import Board
+from gamelog import GameLog
+from profiler import Profiler
+from scores import Scores
+from heatmap import Heatmap
+import snapshot
+from worker import Worker
 
 # TODO: Android crashes on end screen
 # TODO: Images small on android instruction screen
@@ -30,6 +37,12 @@ sm = None
 # Instantiate game board
 game = None
 
+# Background worker for engine computations
+worker = None
+
+# Local leaderboard
+scores = None
+
 
 class Scheme:
     """Contains color scheme & color variables."""
@@ -126,6 +139,14 @@ class GameScreen(Screen):
         self.end = None
         self.time = None
 
+        # Marker color indexes, keyed by marker number
+        self.colors = {}
+
+        # Atom probability overlay
+        self.heatmap = None
+        if heatmap is True:
+            self.heatmap = Heatmap()
+
         # Populate game board
         board = self.ids.board
         space_n = 56
@@ -180,6 +201,12 @@ class GameScreen(Screen):
 
         return
 
+    def on_enter(self):
+        """Start the game timer, however the game screen was reached, unless it is already running."""
+
+        if self.start is None and game.game_over is False:
+            self.timer()
+
     def reset(self):
         """Reset game UI to initial state."""
 
@@ -188,6 +215,11 @@ class GameScreen(Screen):
         self.ids.end_button.disabled = True
         self.ids.end_button.opacity = 0
         self.time = None
+        self.colors = {}
+
+        # Time each game from its own start (see: on_enter)
+        self.start = None
+        self.end = None
 
         board = self.ids.board
 
@@ -207,6 +239,15 @@ class GameScreen(Screen):
         for i in range(1, 6):
             self.ids['tracker' + str(i)].color = scheme.white
 
+        # Clear heatmap overlay
+        if self.heatmap is not None:
+            worker.cancel('heatmap')
+            self.heatmap.reset()
+            self.heatmap.forget()
+            for item in board.children:
+                if isinstance(item, Space) is True:
+                    item.background_color = scheme.black
+
     def update(self):
         """Every time a change is made, update score and guess tracker."""
 
@@ -248,6 +289,86 @@ class GameScreen(Screen):
         # Update
         self.update()
 
+    def state(self):
+        """Returns UI state for snapshots (see: snapshot.dumps)."""
+
+        elapsed = None
+        if self.start is not None:
+            elapsed = (datetime.datetime.now() - self.start).total_seconds()
+
+        return {
+            'elapsed': elapsed,
+            'time': self.time,
+            'next_color': scheme.next_color,
+            'colors': self.colors,
+        }
+
+    def restore(self, state):
+        """Rebuild UI from a restored game board and snapshot UI state."""
+
+        self.reset()
+        self.time = state['time']
+        self.colors = state['colors']
+        scheme.next_color = state['next_color']
+
+        # Resume timer where it left off
+        if state['elapsed'] is not None:
+            self.start = datetime.datetime.now() - datetime.timedelta(seconds=state['elapsed'])
+
+        for item in self.ids.board.children:
+            if isinstance(item, Space) is True:
+                space = game.spacelist[int(item.number)]
+                item.guess = space.guess
+                if space.guess is True:
+                    item.text = 'O'
+                    item.color = scheme.red
+
+            elif isinstance(item, Marker) is True:
+                number = int(item.number)
+                marker = game.markers[number]
+                if marker.symbol is None:
+                    continue
+
+                item.text = str(marker.symbol)
+                if item.text == 'H':
+                    item.color = scheme.hit
+                elif item.text == 'R':
+                    item.color = scheme.reflection
+                else:
+                    index = self.colors.get(number, self.colors.get(marker.link, 0))
+                    item.color = scheme.marker_colors[index]
+
+                # Feed restored beam results back to the heatmap, cleared by reset
+                if item.text == 'H' or item.text == 'R':
+                    self.observe(number, item.text)
+                else:
+                    self.observe(number, marker.link)
+
+        self.update()
+
+    def observe(self, number, outcome):
+        """Feed beam result to the heatmap and update the overlay in the background."""
+
+        if self.heatmap is None:
+            return
+
+        self.heatmap.observe(number, outcome)
+        worker.submit('heatmap', self.heatmap.update, callback=self.tint)
+
+    def tint(self, probabilities):
+        """Tint spaces by the probability that they hold an atom. Only noticeably changed spaces are redrawn."""
+
+        if game.game_over is True:
+            return
+
+        changed = self.heatmap.changes(probabilities)
+        for item in self.ids.board.children:
+            if isinstance(item, Space) is True and int(item.number) in changed:
+                probability = changed[int(item.number)]
+                item.background_color = [
+                    base + (hot - base) * probability for base, hot in zip(scheme.black, scheme.hit)
+                ]
+
     def highlight(self, number, state):
         """Toggle highlighting of marker's link."""
 
@@ -275,6 +396,10 @@ class GameScreen(Screen):
             self.update()
             self.time = self.timer()
 
+            # Record game on the leaderboard
+            seconds = 0.0 if self.end is None else (self.end - self.start).total_seconds()
+            scores.record(game.score, seconds, correct, game.seed)
+
             # Loop through every space and reveal atoms and guess results.
             won = 0
             missed = 0
@@ -346,10 +471,16 @@ class GameScreen(Screen):
 
 class EndScreen(Screen):
 
+    def on_enter(self):
+        """Generate the next board in the background while the end screen is showing."""
+
+        worker.prefetch()
+
     def reset(self):
         """Resets game engine and board UI to initial state."""
 
-        game.reset()
+        # Use the pre-generated board if it is ready
+        game.reset(board=worker.take())
         sm.get_screen('game_screen').reset()
 
 
@@ -413,7 +544,8 @@ class Marker(Button):
             if marker.symbol is None:
 
                 # Send ray
-                game.beam(number)
+                result = game.beam(number)
+                sm.get_screen('game_screen').observe(number, result)
 
                 # Update marker symbol
                 self.text = str(marker.symbol)
@@ -426,6 +558,7 @@ class Marker(Button):
                 else:
                     self.color = scheme.black
                     self.color = scheme.next()
+                    sm.get_screen('game_screen').colors[number] = scheme.marker_colors.index(self.color)
 
                 # Update linked marker symbol, if applicable
                 if marker.link is not None:
@@ -452,11 +585,26 @@ class BlackboxApp(App):
         global sm
         sm = self.sm
 
+        # Log game events for analysis
+        self.log = None
+        if log is True:
+            self.log = GameLog(os.path.join(self.user_data_dir, 'games.log'))
+
         # Instantiate game engine
-        self.game = Board()
+        self.game = Board(log=self.log)
         global game
         game = self.game
 
+        # Instantiate background worker
+        self.worker = Worker()
+        global worker
+        worker = self.worker
+
+        # Open leaderboard
+        self.scores = Scores(os.path.join(self.user_data_dir, 'scores.db'))
+        global scores
+        scores = self.scores
+
         # Set window size on desktop
         if platform.system() == 'Windows':
             Window.size = 540, 960
@@ -476,12 +624,59 @@ class BlackboxApp(App):
         sm.add_widget(GameScreen(name='game_screen'))
         sm.add_widget(EndScreen(name='end_screen'))
 
+        # Resume game in progress, in case the app was killed while paused
+        self.snapshot_path = os.path.join(self.user_data_dir, 'snapshot.bin')
+        state = snapshot.load(self.snapshot_path, game)
+        if state is not None:
+            if game.game_over is False and state['elapsed'] is not None:
+                sm.get_screen('game_screen').restore(state)
+                sm.current = 'game_screen'
+            else:
+                game.reset()
+                sm.get_screen('game_screen').reset()
+            snapshot.discard(self.snapshot_path)
+
+        self.profiler = None
+
         # return screen manager as root widget
         return sm
 
+    def on_start(self):
+
+        # Debug overlay measuring frame times and input latency, drawn over the root widget
+        if profile is True:
+            stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+            self.profiler = Profiler(os.path.join(self.user_data_dir, 'trace-' + stamp + '.csv'))
+            self.profiler.wrap(GameScreen, 'update', 'symbol', 'highlight', 'end_game')
+            self.profiler.wrap(Marker, 'press', touch=True)
+            self.profiler.wrap(Space, 'press', touch=True)
+
     def on_pause(self):
+        self.save()
+        if self.log is not None:
+            self.log.flush()
+        if self.profiler is not None:
+            self.profiler.flush()
         return True
 
+    def on_stop(self):
+        self.save()
+        worker.shutdown()
+        scores.close()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.log is not None:
+            self.log.close()
+
+    def save(self):
+        """Snapshot game in progress, or discard the snapshot if there is none."""
+
+        game_screen = sm.get_screen('game_screen')
+        if game.game_over is False and game_screen.start is not None:
+            snapshot.save(self.snapshot_path, game, game_screen.state())
+        else:
+            snapshot.discard(self.snapshot_path)
+
 
 # if __name__ == '__main__':
 BlackboxApp().run()
@@ -0,0 +1,222 @@
+import argparse
+import mmap
+import struct
+from random import Random
+
+from config import dimension, atoms, SHAPE
+from engine import Board, Ray, HIT, REFLECTION, EDGE
+from topology import get
+
+# Header: magic, version, shape, dimension, atoms, cells, markers, record size, puzzles
+HEADER = struct.Struct('<4sB8sBBHHHI')
+MAGIC = b'BBXP'
+VERSION = 1
+
+# Difficulty metadata: hits, reflections, exits, detours (exits and hits after turning), total turns
+META = struct.Struct('<BBBBH')
+
+
+class Puzzle:
+    """
+    One puzzle in a pack. Decodes its record on demand.
+
+    seed        Seed the atoms were placed from (see: Board.reset).
+    atomlist    List of the coordinates of atoms.
+    fields      Field codes of every space (see: Board.fields).
+    outcomes    Outcome code of every marker (see: Board.outcome), indexed by marker number.
+    hits, reflections, exits, detours, turns
+                Difficulty metadata over all markers.
+    """
+
+    def __init__(self, pack, record):
+        self.pack = pack
+        self.record = record
+
+    @property
+    def seed(self):
+        return struct.unpack_from('<I', self.record)[0]
+
+    @property
+    def atomlist(self):
+        cells = self.pack.topology.cells
+        start = self.pack.atoms_at
+        return [cells[cell] for cell in self.record[start:start + self.pack.atoms]]
+
+    @property
+    def fields(self):
+        start = self.pack.fields_at
+        return self.record[start:start + self.pack.cells].tolist()
+
+    @property
+    def outcomes(self):
+        start = self.pack.outcomes_at
+        return [None] + self.record[start:start + self.pack.markers].cast('b').tolist()
+
+    @property
+    def meta(self):
+        return META.unpack_from(self.record, self.pack.meta_at)
+
+    @property
+    def hits(self):
+        return self.meta[0]
+
+    @property
+    def reflections(self):
+        return self.meta[1]
+
+    @property
+    def exits(self):
+        return self.meta[2]
+
+    @property
+    def detours(self):
+        return self.meta[3]
+
+    @property
+    def turns(self):
+        return self.meta[4]
+
+    def load(self, board):
+        """Set up board with this puzzle, without computing fields or sending rays."""
+
+        board.reset(atomlist=self.atomlist, seed=self.seed, fields=self.fields, outcomes=self.outcomes)
+        return board
+
+
+class Pack:
+    """
+    Memory-mapped puzzle pack. Opening only reads the header, and puzzles are fixed-width records
+    found by their position, so packs of any size open instantly and give random access to any puzzle.
+
+    Record: seed, atom space numbers, field code of every space, outcome code of every marker, metadata.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, shape, size, self.atoms, self.cells, self.markers,
+         self.size, self.count) = HEADER.unpack_from(self.map)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a puzzle pack')
+
+        self.topology = get(shape.rstrip(b'\0').decode('ascii'), size)
+        if self.cells != len(self.topology.cells) or self.markers != self.topology.markers:
+            raise ValueError('puzzle pack does not match its board shape')
+
+        self.view = memoryview(self.map)
+
+        # Record layout
+        self.atoms_at = 4
+        self.fields_at = self.atoms_at + self.atoms
+        self.outcomes_at = self.fields_at + self.cells
+        self.meta_at = self.outcomes_at + self.markers
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        """Returns puzzle n."""
+
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError('puzzle out of range')
+
+        start = HEADER.size + n * self.size
+        return Puzzle(self, self.view[start:start + self.size])
+
+    def load(self, n, board):
+        """Set up board with puzzle n. Returns the board."""
+
+        return self[n].load(board)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+
+def record(board):
+    """Returns the pack record of the board's current puzzle."""
+
+    topology = board.topology
+    outcomes = []
+    hits = reflections = exits = detours = turns = 0
+
+    for number in range(1, topology.markers + 1):
+        ray = Ray(number, topology)
+        outcome = board.shoot(ray, count=True)
+        outcomes.append(outcome)
+        turns += ray.turns
+
+        if outcome == HIT:
+            hits += 1
+        elif outcome == REFLECTION or outcome == EDGE:
+            reflections += 1
+        else:
+            exits += 1
+        if outcome >= 0 and ray.turns > 0:
+            detours += 1
+
+    return b''.join([
+        struct.pack('<I', board.seed or 0),
+        bytes(topology.index[atom] for atom in board.atomlist),
+        bytes(board.fields),
+        struct.pack('<%db' % topology.markers, *outcomes),
+        META.pack(hits, reflections, exits, detours, min(turns, 0xFFFF)),
+    ])
+
+
+def build(path, count, seed=0):
+    """Generate a pack of count random puzzles at path, reproducibly from seed."""
+
+    random = Random(seed)
+    board = Board()
+    topology = board.topology
+    size = 4 + atoms + len(topology.cells) + topology.markers + META.size
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, SHAPE.encode('ascii'), dimension, atoms, len(topology.cells),
+                            topology.markers, size, count))
+
+        chunk = []
+        for i in range(count):
+            board.reset(seed=random.getrandbits(32))
+            chunk.append(record(board))
+            if len(chunk) == 4096:
+                f.write(b''.join(chunk))
+                chunk = []
+        f.write(b''.join(chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect puzzle packs.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('build', help='generate a pack of random puzzles')
+    command.add_argument('path')
+    command.add_argument('count', type=int)
+    command.add_argument('--seed', type=int, default=0)
+
+    command = commands.add_parser('show', help='print puzzles from a pack')
+    command.add_argument('path')
+    command.add_argument('numbers', type=int, nargs='*')
+
+    options = parser.parse_args()
+
+    if options.command == 'build':
+        build(options.path, options.count, options.seed)
+
+    elif options.command == 'show':
+        pack = Pack(options.path)
+        print(len(pack), 'puzzles')
+        for n in options.numbers:
+            puzzle = pack[n]
+            print(n, 'seed', puzzle.seed, 'atoms', puzzle.atomlist, 'hits', puzzle.hits,
+                  'reflections', puzzle.reflections, 'exits', puzzle.exits, 'detours', puzzle.detours,
+                  'turns', puzzle.turns)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+from functools import wraps
+from time import perf_counter_ns, time
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.uix.label import Label
+
+from instrument import Histogram
+
+
+class Profiler:
+    """
+    Debug overlay measuring frame times, touch-to-render latency and time spent in UI methods.
+
+    Frame times are measured between buffer flips. A touch is stamped with the time its event arrived
+    when a wrapped press handler runs, and its latency is taken at the next flip, so time spent queued
+    before the handler counts too. Every measurement can also be written to a trace
+    file, one 'kind,name,timestamp,ns' line each, for comparing builds offline.
+    """
+
+    def __init__(self, path=None):
+        """Start profiling. If a path is given, measurements are traced to it."""
+
+        self.frames = Histogram()
+        self.touches = Histogram()
+        self.sections = {}
+
+        self.last_flip = None
+        self.touched = None
+
+        self.trace = None
+        if path is not None:
+            self.trace = open(path, 'w')
+            self.trace.write('kind,name,timestamp,ns\n')
+
+        # Overlay
+        self.label = Label(
+            size_hint=(None, None),
+            font_size=Window.height / 50,
+            color=(1, 1, 1, 0.8),
+            halign='left',
+            valign='top',
+        )
+        self.label.bind(texture_size=self.label.setter('size'))
+
+        Window.bind(on_flip=self.flip)
+        Window.add_widget(self.label)
+        self.refresh = Clock.schedule_interval(self.draw, 0.5)
+
+    def record(self, kind, name, ns):
+        """Write a measurement to the trace file."""
+
+        if self.trace is not None:
+            self.trace.write(kind + ',' + name + ',' + str(perf_counter_ns()) + ',' + str(ns) + '\n')
+
+    def flip(self, window):
+        """Called after every rendered frame."""
+
+        now = perf_counter_ns()
+
+        if self.last_flip is not None:
+            self.frames.add(now - self.last_flip)
+            self.record('frame', '', now - self.last_flip)
+        self.last_flip = now
+
+        if self.touched is not None:
+            name, start = self.touched
+            self.touched = None
+            ns = max(0, int((time() - start) * 1e9))
+            self.touches.add(ns)
+            self.record('touch', name, ns)
+
+    def touch(self, name, event=None):
+        """
+        Stamp a touch, to be measured at the next rendered frame. Only the first touch before a frame counts.
+
+        'event' is the touch's motion event. It is stamped with the time the touch came down, or went up
+        if it has been released, or with the current time if there is no event.
+        """
+
+        if self.touched is None:
+            start = time()
+            if event is not None:
+                start = event.time_end if event.time_end > 0 else event.time_start
+            self.touched = (name, start)
+
+    def wrap(self, cls, *names, touch=False):
+        """
+        Time the named methods of the given class.
+
+        If 'touch' is True, the methods are button handlers and also stamp the button's last touch.
+        """
+
+        for name in names:
+            method = getattr(cls, name)
+            label = cls.__name__ + '.' + name
+            self.sections[label] = Histogram()
+            setattr(cls, name, self.timed(method, label, touch))
+
+    def timed(self, method, label, touch):
+        """Returns the method wrapped to record its running time."""
+
+        histogram = self.sections[label]
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            if touch is True:
+                self.touch(label, getattr(args[0], 'last_touch', None))
+            try:
+                return method(*args, **kwargs)
+            finally:
+                ns = perf_counter_ns() - start
+                histogram.add(ns)
+                self.record('section', label, ns)
+
+        return wrapper
+
+    def draw(self, dt):
+        """Update the overlay."""
+
+        lines = [
+            'frame  p50 %.1f  p99 %.1f ms' % (self.frames.percentile(0.5) / 1e6, self.frames.percentile(0.99) / 1e6),
+            'touch  p50 %.1f  p99 %.1f ms' % (self.touches.percentile(0.5) / 1e6, self.touches.percentile(0.99) / 1e6),
+        ]
+        for label, histogram in self.sections.items():
+            if histogram.count > 0:
+                lines.append('%s  mean %.2f ms' % (label, histogram.total / histogram.count / 1e6))
+
+        self.label.text = '\n'.join(lines)
+        self.label.pos = (0, Window.height - self.label.height)
+
+    def flush(self):
+        """Write buffered trace lines to the trace file, as the app may be killed without stopping."""
+
+        if self.trace is not None:
+            self.trace.flush()
+
+    def stop(self):
+        """Stop profiling and close the trace file."""
+
+        Window.unbind(on_flip=self.flip)
+        Window.remove_widget(self.label)
+        self.refresh.cancel()
+
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
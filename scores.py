@@ -0,0 +1,113 @@
+import sqlite3
+from queue import Queue, Empty
+from threading import Thread, local
+from time import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    found INTEGER NOT NULL,
+    seed INTEGER,
+    played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (score, seconds);
+CREATE INDEX IF NOT EXISTS games_by_time ON games (seconds, score);
+'''
+
+# Leaderboard orderings. Lower is better for both score and time.
+ORDER = {
+    'score': 'score, seconds',
+    'time': 'seconds, score',
+}
+
+
+class Scores:
+    """
+    Local leaderboard of finished games, stored in SQLite.
+
+    Games are recorded from any thread without blocking it: they are queued and written in batches,
+    one transaction per batch, by a background thread. The database runs in WAL mode, so leaderboard
+    queries are not blocked by writes either.
+    """
+
+    def __init__(self, path, batch=64):
+        """
+        Open leaderboard at path, creating it if needed.
+
+        'batch' is the largest number of games written in one transaction.
+        """
+
+        self.path = path
+        self.batch = batch
+        self.queue = Queue()
+        self.readers = local()
+
+        connection = self.connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self.writer = Thread(target=self.write, daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        """Returns a new connection to the database."""
+
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def record(self, score, seconds, found, seed=None):
+        """Queue a finished game for writing."""
+
+        self.queue.put((score, seconds, found, seed, time()))
+
+    def write(self):
+        """Write queued games in batches until closed. Runs on the writer thread."""
+
+        connection = self.connect()
+        while True:
+            games = [self.queue.get()]
+
+            # Gather whatever else is waiting, up to a full batch
+            while len(games) < self.batch:
+                try:
+                    games.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            closing = None in games
+            games = [game for game in games if game is not None]
+
+            if games:
+                with connection:
+                    connection.executemany(
+                        'INSERT INTO games (score, seconds, found, seed, played) VALUES (?, ?, ?, ?, ?)', games)
+
+            if closing is True:
+                break
+
+        connection.close()
+
+    def top(self, n=100, by='score'):
+        """
+        Returns the best n games, ordered by 'score' or 'time'.
+
+        Each game is a tuple of (score, seconds, found, seed, played).
+        """
+
+        connection = getattr(self.readers, 'connection', None)
+        if connection is None:
+            connection = self.readers.connection = self.connect()
+
+        return connection.execute(
+            'SELECT score, seconds, found, seed, played FROM games ORDER BY ' + ORDER[by] + ' LIMIT ?', (n,)
+        ).fetchall()
+
+    def close(self):
+        """Write remaining games and stop the writer thread."""
+
+        self.queue.put(None)
+        self.writer.join()
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+from collections import OrderedDict
+from secrets import token_hex
+from time import monotonic
+
+from engine import Board
+import instrument
+import snapshot
+
+# UI state stored with packed sessions (see: snapshot.dumps)
+HEADLESS = {'elapsed': None, 'time': None, 'next_color': 0, 'colors': {}}
+
+HELP = 'commands: NEW, USE <session>, BEAM <marker>, GUESS <x> <y>, END, SCORE, QUIT'
+
+
+class Sessions:
+    """
+    Game boards hosted by the server, keyed by session token.
+
+    Tokens are random, so a session can only be used by clients it was handed to.
+
+    Only the most recently used boards are kept live. The rest are packed into snapshots of a
+    hundred or so bytes (see: snapshot.py) and unpacked into a recycled board when used again,
+    so thousands of sessions fit in a modest amount of memory.
+    """
+
+    def __init__(self, live=1024, idle=600):
+        """
+        'live'  Number of boards kept unpacked.
+        'idle'  Seconds after which an unused session is evicted.
+        """
+
+        self.live = live
+        self.idle = idle
+        self.boards = OrderedDict()
+        self.packed = {}
+        self.seen = {}
+
+    def __len__(self):
+        return len(self.seen)
+
+    def new(self):
+        """Start a new game. Returns its session token."""
+
+        token = token_hex(16)
+        while token in self.seen:
+            token = token_hex(16)
+
+        board = self.recycle()
+        if board is None:
+            board = Board()
+        else:
+            board.reset()
+
+        self.boards[token] = board
+        self.seen[token] = monotonic()
+        return token
+
+    def get(self, token):
+        """Returns the board for the given session, or None if there is no such session."""
+
+        board = self.boards.get(token)
+        if board is not None:
+            self.boards.move_to_end(token)
+
+        elif token in self.packed:
+            board = self.recycle()
+            if board is None:
+                board = Board()
+            snapshot.loads(self.packed.pop(token), board)
+            self.boards[token] = board
+
+        else:
+            return None
+
+        self.seen[token] = monotonic()
+        return board
+
+    def recycle(self):
+        """If too many boards are live, pack the least recently used one and return it for reuse."""
+
+        if len(self.boards) < self.live:
+            return None
+
+        token, board = self.boards.popitem(last=False)
+        self.packed[token] = snapshot.dumps(board, HEADLESS)
+        return board
+
+    def evict(self):
+        """Drop sessions that have been idle for too long. Returns the number dropped."""
+
+        cutoff = monotonic() - self.idle
+        stale = [token for token, seen in self.seen.items() if seen < cutoff]
+        for token in stale:
+            del self.seen[token]
+            self.boards.pop(token, None)
+            self.packed.pop(token, None)
+        return len(stale)
+
+
+class Server:
+    """
+    Line protocol server hosting headless games.
+
+    Each command is one line, answered with one line starting with 'OK' or 'ERR'. A connection works
+    on one session at a time: NEW starts a game and USE attaches to an existing one, which allows
+    picking a game up again from another connection. Sessions are named by unguessable tokens, so only
+    a client given a session's token can use it.
+
+    NEW                 OK <session>
+    USE <session>       OK <session>
+    BEAM <marker>       OK <H | R | exit marker>
+    GUESS <x> <y>       OK <result of Board.guess>
+    END                 OK <atoms correct> <score>
+    SCORE               OK <score>
+    QUIT                closes the connection
+    """
+
+    def __init__(self, sessions=None):
+        self.sessions = sessions if sessions is not None else Sessions()
+
+    async def handle(self, reader, writer):
+        """Serve one connection."""
+
+        session = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                words = line.decode('ascii', 'replace').split()
+                if words and words[0].upper() == 'QUIT':
+                    break
+
+                session, reply = self.command(session, words)
+                writer.write(reply.encode('ascii') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def command(self, session, words):
+        """Run one command for the given session. Returns the (possibly new) session and the reply."""
+
+        if not words:
+            return session, 'ERR ' + HELP
+
+        verb = words[0].upper()
+        args = words[1:]
+
+        try:
+            if verb == 'NEW':
+                session = self.sessions.new()
+                return session, 'OK ' + session
+
+            if verb == 'USE':
+                if self.sessions.get(args[0]) is None:
+                    return session, 'ERR no such session'
+                return args[0], 'OK ' + args[0]
+
+            if session is None:
+                return session, 'ERR no session'
+            board = self.sessions.get(session)
+            if board is None:
+                return None, 'ERR session expired'
+
+            if verb == 'SCORE':
+                return session, 'OK ' + str(board.score)
+
+            if board.game_over is True:
+                return session, 'ERR game over'
+
+            if verb == 'BEAM':
+                number = int(args[0])
+                if not 0 < number <= board.topology.markers:
+                    return session, 'ERR no such marker'
+                if board.markers[number].symbol is not None:
+                    return session, 'ERR marker used'
+                return session, 'OK ' + str(board.beam(number))
+
+            if verb == 'GUESS':
+                return session, 'OK ' + str(board.guess(int(args[0]), int(args[1])))
+
+            if verb == 'END':
+                correct = board.endscore()
+                return session, 'OK ' + str(correct) + ' ' + str(board.score)
+
+        except (IndexError, ValueError):
+            return session, 'ERR bad arguments'
+
+        return session, 'ERR ' + HELP
+
+    async def evict(self):
+        """Evict idle sessions periodically."""
+
+        while True:
+            await asyncio.sleep(self.sessions.idle / 4)
+            self.sessions.evict()
+
+    async def serve(self, host, port):
+        """Serve forever."""
+
+        server = await asyncio.start_server(self.handle, host, port)
+        self.evictor = asyncio.ensure_future(self.evict())
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host headless Black Box games over a line protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--live', type=int, default=1024, help='boards kept unpacked')
+    parser.add_argument('--idle', type=float, default=600, help='seconds before idle sessions are evicted')
+    parser.add_argument('--stats', type=float, default=0, help='dump engine stats to stderr every so many seconds')
+    options = parser.parse_args()
+
+    if options.stats > 0:
+        instrument.enable().start(options.stats)
+
+    server = Server(Sessions(options.live, options.idle))
+    try:
+        asyncio.run(server.serve(options.host, options.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
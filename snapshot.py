@@ -0,0 +1,161 @@
+import os
+import struct
+
+from config import dimension
+
+# Header: magic, version, dimension, atoms, guesses, symbols, flags, next color, score, elapsed seconds, seed,
+# time text
+HEADER = struct.Struct('<3sBBBBBBBHdI8s')
+MAGIC = b'BBX'
+VERSION = 2
+
+# Per marker: symbol, link, color index
+MARKER = struct.Struct('<BBB')
+
+# Flags
+GAME_OVER = 1
+TIMER = 2
+SEED = 4
+
+# Unset marker fields
+NONE = 0xFF
+
+
+def dumps(board, ui):
+    """
+    Pack game board and UI state into a compact binary snapshot.
+
+    'ui' is a dict of UI state:
+    elapsed     Seconds since the game timer started, or None if it has not been started.
+    time        Formatted elapsed time at the end of the game, or None.
+    next_color  Index of the next marker color (see: Scheme.next).
+    colors      Dict of marker color indexes, keyed by marker number.
+    """
+
+    flags = 0
+    if board.game_over is True:
+        flags |= GAME_OVER
+    if ui['elapsed'] is not None:
+        flags |= TIMER
+    if board.seed is not None:
+        flags |= SEED
+
+    time = (ui['time'] or '').encode('ascii')
+
+    parts = [HEADER.pack(
+        MAGIC, VERSION, dimension, len(board.atomlist), len(board.guesslist), len(board.symbols), flags,
+        ui['next_color'], board.score, ui['elapsed'] or 0.0, board.seed or 0, time,
+    )]
+
+    # Atoms and guesses are stored by space number
+    index = board.topology.index
+    parts.append(bytes(index[atom] for atom in board.atomlist))
+    parts.append(bytes(index[guess] for guess in board.guesslist))
+    parts.append(bytes(board.symbols))
+
+    for number in range(1, board.topology.markers + 1):
+        marker = board.markers[number]
+        parts.append(MARKER.pack(
+            NONE if marker.symbol is None else ord(marker.symbol),
+            NONE if marker.link is None else marker.link,
+            ui['colors'].get(number, NONE),
+        ))
+
+    return b''.join(parts)
+
+
+def loads(data, board):
+    """
+    Restore game board from a snapshot, in place, without replaying moves. Marker indexes are preserved.
+
+    Returns dict of UI state (see: dumps). Raises ValueError if the snapshot is not usable.
+    If the board keeps a game log, the restored game is logged as resumed (see: GameLog.resume).
+    """
+
+    (magic, version, size, n_atoms, n_guesses, n_symbols, flags,
+     next_color, score, elapsed, seed, time) = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION or size != dimension:
+        raise ValueError('incompatible snapshot')
+
+    markers = board.topology.markers
+    cells = board.topology.cells
+
+    offset = HEADER.size
+    if len(data) != offset + n_atoms + n_guesses + n_symbols + MARKER.size * markers:
+        raise ValueError('truncated snapshot')
+
+    atomlist = [cells[n] for n in data[offset:offset + n_atoms]]
+    offset += n_atoms
+    guesslist = [cells[n] for n in data[offset:offset + n_guesses]]
+    offset += n_guesses
+    symbols = list(data[offset:offset + n_symbols])
+    offset += n_symbols
+
+    # Rebuild spaces and fields from atoms
+    board.atomlist = atomlist
+    board.seed = seed if flags & SEED else None
+    board.outcomes = None
+    board.populate()
+    board.markers_reset()
+    board.guesslist = guesslist
+    board.symbols = symbols
+    board.score = score
+    board.game_over = bool(flags & GAME_OVER)
+
+    for guess in guesslist:
+        board.spaces[guess].guess = True
+        if board.game_over is True:
+            board.spaces[guess].correct = guess in atomlist
+
+    colors = {}
+    for number in range(1, markers + 1):
+        symbol, link, color = MARKER.unpack_from(data, offset)
+        offset += MARKER.size
+
+        marker = board.markers[number]
+        if symbol != NONE:
+            marker.symbol = chr(symbol)
+        if link != NONE:
+            marker.link = link
+        if color != NONE:
+            colors[number] = color
+
+    if board.log is not None:
+        board.log.resume(atomlist, score, guesslist)
+
+    return {
+        'elapsed': elapsed if flags & TIMER else None,
+        'time': time.rstrip(b'\0').decode('ascii') or None,
+        'next_color': next_color,
+        'colors': colors,
+    }
+
+
+def save(path, board, ui):
+    """Write snapshot to path atomically, so a killed app never leaves a partial snapshot behind."""
+
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(dumps(board, ui))
+    os.replace(temp, path)
+
+
+def load(path, board):
+    """Restore game board from snapshot at path. Returns dict of UI state, or None if there is no usable snapshot."""
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        return loads(data, board)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def discard(path):
+    """Remove snapshot at path, if any."""
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
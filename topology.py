@@ -0,0 +1,209 @@
+import marshal
+import os
+import tempfile
+from math import atan2, pi, sqrt
+
+from config import cache
+
+# Bump when the tables change, so stale cache files are ignored
+VERSION = 2
+
+# Field code of a space holding an atom (see: Board.check)
+ATOM = 9
+
+
+class Topology:
+    """
+    Precomputed tables describing a board shape, so rays can be traced without knowing the shape.
+
+    Spaces are numbered cells. Directions are numbered counter-clockwise. Fields are numbered codes:
+    0 is empty, 1 to directions are corner fields (one per pair of neighbouring directions), then mirror,
+    then cross, and ATOM marks an atom.
+
+    cells       List of the (x, y) coordinates of each cell.
+    index       Dict of cell numbers, keyed by coordinates.
+    sites       Cells where atoms may be placed.
+    box         Lowest and highest coordinate tried when placing atoms at random (see: Board.reset).
+    directions  Number of directions.
+    markers     Number of markers around the board edge.
+    step        step[cell * directions + direction] is the next cell, or minus the exit marker.
+    turn        turn[field * directions + direction] is the direction after crossing a field.
+    corners     corners[cell] is a tuple of (cell, field) corner fields cast by an atom at cell, in field order.
+    crosses     crosses[cell] is a tuple of cells given cross fields by an atom at cell.
+    entries     entries[marker] is the (cell, direction) a ray sent from marker starts with.
+    sides       sides[marker] is a tuple of cells where an atom reflects the ray immediately.
+    """
+
+    def __init__(self, tables):
+        (self.shape, self.dimension, self.cells, self.sites, self.box, self.directions, self.markers,
+         self.step, self.turn, self.corners, self.crosses, self.entries, self.sides) = tables
+
+        self.index = {cell: number for number, cell in enumerate(self.cells)}
+        self.mirror = self.directions + 1
+        self.cross = self.directions + 2
+
+    def tables(self):
+        return (self.shape, self.dimension, self.cells, self.sites, self.box, self.directions, self.markers,
+                self.step, self.turn, self.corners, self.crosses, self.entries, self.sides)
+
+
+def square(dimension):
+    """
+    Square grid. Returns cells, direction vectors, side rotation, whether corner fields act as mirrors
+    (see: build), atom sites, atom box, and a function giving the position of coordinates in the plane.
+    """
+
+    cells = [(x, y) for y in range(dimension) for x in range(dimension)]
+    vectors = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+    # Atoms are never placed in the first row or column
+    sites = [(x, y) for (x, y) in cells if x > 0 and y > 0]
+    box = (1, dimension - 1)
+
+    return cells, vectors, 1, False, sites, box, lambda x, y: (x, y)
+
+
+def hexagon(dimension):
+    """Hexagonal board with sides of dimension cells, in axial coordinates (see: square)."""
+
+    radius = dimension - 1
+    cells = [(q, r) for r in range(-radius, radius + 1) for q in range(-radius, radius + 1)
+             if abs(q + r) <= radius]
+    vectors = [(1, 0), (0, 1), (-1, 1), (-1, 0), (0, -1), (1, -1)]
+
+    # Atoms are placed off the board edge
+    sites = [(q, r) for (q, r) in cells if max(abs(q), abs(r), abs(q + r)) < radius]
+    box = (-radius + 1, radius - 1)
+
+    # Corner fields only turning rays heading towards the atom would let rays coming from the side
+    # circle forever, or leave at a marker that does not lead back.
+    return cells, vectors, 2, True, sites, box, lambda q, r: (q + r / 2, r * sqrt(3) / 2)
+
+
+SHAPES = {
+    'SQUARE': square,
+    'HEX': hexagon,
+}
+
+
+def build(shape, dimension):
+    """Compute the tables for the given shape and dimension."""
+
+    cells, vectors, side, mirrored, sites, box, plane = SHAPES[shape](dimension)
+    index = {cell: number for number, cell in enumerate(cells)}
+    directions = len(vectors)
+
+    def neighbour(cell, direction):
+        x, y = cells[cell]
+        dx, dy = vectors[direction % directions]
+        return index.get((x + dx, y + dy))
+
+    def opposite(direction):
+        return (direction + directions // 2) % directions
+
+    # Rays enter wherever a cell's neighbour lies off the board. Markers are numbered counter-clockwise,
+    # starting from the upper left.
+    entries = [(cell, direction) for cell in range(len(cells)) for direction in range(directions)
+               if neighbour(cell, opposite(direction)) is None]
+
+    xs, ys = zip(*(plane(*cell) for cell in cells))
+    cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+
+    def angle(entry):
+        cell, direction = entry
+        x, y = cells[cell]
+        dx, dy = vectors[opposite(direction)]
+        px, py = plane(x + dx / 2, y + dy / 2)
+        return round((atan2(py - cy, px - cx) - 3 * pi / 4) % (2 * pi), 9)
+
+    entries.sort(key=angle)
+    numbers = {entry: number + 1 for number, entry in enumerate(entries)}
+
+    # Step table, leaving the board through the marker a ray would enter by in the opposite direction
+    step = []
+    for cell in range(len(cells)):
+        for direction in range(directions):
+            following = neighbour(cell, direction)
+            if following is None:
+                following = -numbers[(cell, opposite(direction))]
+            step.append(following)
+
+    # Corner field n lies between directions n - 1 and n. It turns rays heading back along either
+    # direction onto the other, away from the atom.
+    #
+    # Mirrored corner fields reflect every ray about the line through them square to the atom, so
+    # rays heading away from the atom are turned as well. Each field then maps directions one to one,
+    # so every ray can be traced backwards: none can loop, and a ray sent back from where one left
+    # retraces its path.
+    rows = max(ATOM, directions + 2) + 1
+    turn = list(range(directions)) * rows
+    for field in range(1, directions + 1):
+        first, second = field - 1, field % directions
+        if mirrored:
+            for direction in range(directions):
+                turn[field * directions + direction] = (first + second + directions // 2 - direction) % directions
+        else:
+            turn[field * directions + opposite(first)] = second
+            turn[field * directions + opposite(second)] = first
+
+    corners = []
+    crosses = []
+    for cell in range(len(cells)):
+        x, y = cells[cell]
+        cast = []
+        for field in range(1, directions + 1):
+            (ax, ay), (bx, by) = vectors[field - 1], vectors[field % directions]
+            target = index.get((x + ax + bx, y + ay + by))
+            if target is not None:
+                cast.append((target, field))
+        corners.append(tuple(cast))
+        crosses.append(tuple(neighbour(cell, direction) for direction in range(directions)
+                             if neighbour(cell, direction) is not None))
+
+    # Atoms beside the point of entry reflect rays immediately
+    sides = [()]
+    for cell, direction in entries:
+        sides.append(tuple(neighbour(cell, direction + turn) for turn in (side, -side)
+                           if neighbour(cell, direction + turn) is not None))
+
+    return (shape, dimension, cells, [index[site] for site in sites], box, directions, len(entries),
+            step, turn, corners, crosses, [None] + entries, sides)
+
+
+# Topologies already loaded, keyed by (shape, dimension)
+loaded = {}
+
+
+def get(shape, dimension):
+    """Returns the Topology for the given shape and dimension, from memory, the disk cache, or built fresh."""
+
+    key = (shape, dimension)
+    if key in loaded:
+        return loaded[key]
+
+    path = os.path.join(cache, 'topology-%s-%d-v%d.bin' % (shape.lower(), dimension, VERSION))
+    tables = None
+    try:
+        with open(path, 'rb') as f:
+            tables = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    if tables is None or tables[:2] != (shape, dimension):
+        tables = build(shape, dimension)
+        # Processes may build tables at once, so each writes its own file before moving it into place
+        try:
+            os.makedirs(cache, exist_ok=True)
+            handle, temp = tempfile.mkstemp(dir=cache, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as f:
+                    marshal.dump(tables, f)
+                os.replace(temp, path)
+            except OSError:
+                os.unlink(temp)
+                raise
+        except OSError:
+            pass
+
+    loaded[key] = Topology(tables)
+    return loaded[key]
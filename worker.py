@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from threading import Lock
+
+from engine import Board
+
+logger = getLogger(__name__)
+
+
+class Worker:
+    """
+    Runs engine computations off the Kivy main loop and delivers their results back to it.
+
+    Jobs are submitted under a tag. Submitting a new job under a tag supersedes the previous one:
+    it is cancelled if it has not started yet, and its result is discarded if it has. Results are
+    handed to their callbacks on the main loop through the Clock. Jobs that raise are logged, or their
+    exception is handed to an error callback, so a failing job cannot crash the app.
+    """
+
+    def __init__(self, schedule=None, executor=None):
+        """
+        Start the worker.
+
+        'schedule' calls a function on the main loop, defaulting to Clock.schedule_once.
+        'executor' runs the jobs, defaulting to a single background thread. Jobs share state with the
+        app, such as the heatmap updated in place by GameScreen.observe, so they must run in this
+        process: a process pool would run them on pickled copies and their changes would be lost.
+        """
+
+        if schedule is None:
+            from kivy.clock import Clock
+            schedule = Clock.schedule_once
+
+        self.schedule = schedule
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.jobs = {}
+        self.lock = Lock()
+
+        # Next game board, generated while the end screen is showing
+        self.board = None
+
+    def submit(self, tag, function, *args, callback=None, error=None):
+        """
+        Run function(*args) in the background, superseding any job with the same tag. Returns the future.
+
+        'callback' is passed the result. If the job raises, 'error' is passed the exception instead.
+        """
+
+        with self.lock:
+            stale = self.jobs.get(tag)
+            if stale is not None:
+                stale.cancel()
+
+            future = self.executor.submit(function, *args)
+            self.jobs[tag] = future
+
+        # Hand the result back to the main loop once finished
+        future.add_done_callback(lambda done: self.schedule(lambda dt: self.deliver(tag, done, callback, error)))
+        return future
+
+    def deliver(self, tag, future, callback, error=None):
+        """Called on the main loop. Passes the result of a finished job to its callback unless it went stale."""
+
+        with self.lock:
+            if self.jobs.get(tag) is not future:
+                return
+            del self.jobs[tag]
+
+        if future.cancelled():
+            return
+
+        exception = future.exception()
+        if exception is not None:
+            if error is not None:
+                error(exception)
+            else:
+                logger.error('Worker: %s job failed', tag, exc_info=exception)
+            return
+
+        if callback is not None:
+            callback(future.result())
+
+    def cancel(self, tag):
+        """Cancel the job with the given tag. A job already running finishes, but its result is dropped."""
+
+        with self.lock:
+            future = self.jobs.pop(tag, None)
+
+        if future is not None:
+            future.cancel()
+
+    def busy(self, tag):
+        """Returns True if a job with the given tag has not been delivered yet."""
+
+        return tag in self.jobs
+
+    def prefetch(self):
+        """Generate the next game board in the background."""
+
+        if self.board is None and not self.busy('board'):
+            self.submit('board', Board, callback=self.store)
+
+    def store(self, board):
+        """Keep a pre-generated board until it is needed."""
+
+        self.board = board
+
+    def take(self):
+        """Returns the pre-generated board, or None if it is not ready yet."""
+
+        board = self.board
+        self.board = None
+        return board
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the background thread."""
+
+        for tag in list(self.jobs):
+            self.cancel(tag)
+        self.executor.shutdown(wait=False)